@@ -0,0 +1,100 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+
+
+class AdvertCache:
+    """Trwały cache statystyk ogłoszeń w SQLite, kluczowany ID ogłoszenia.
+
+    Ogłoszenia zakończone (`removed_by_user`/`outdated`) mają już niezmienne liczby,
+    więc przy ponownym skanie ich /statistics i /threads nie są pobierane ponownie.
+    Wpis jest ważny tylko dla statusu, z którym został zapisany.
+    """
+
+    COMMIT_CO = 200  # Zapisy grupujemy w transakcje, żeby nie płacić fsync za każde ogłoszenie
+
+    def __init__(self, sciezka, statusy_stale=('removed_by_user', 'outdated')):
+        self.sciezka = sciezka
+        self.statusy_stale = set(statusy_stale)
+        self.trafienia = 0
+        self.chybienia = 0
+        self._niezatwierdzone = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(sciezka, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ogloszenia (
+                id INTEGER PRIMARY KEY,
+                status TEXT,
+                created_at TEXT,
+                tytul TEXT,
+                opis TEXT,
+                id_kategorii INTEGER,
+                statystyki TEXT,
+                liczba_wiadomosci INTEGER,
+                nagroda REAL,
+                zaktualizowano TEXT
+            )""")
+        self._conn.commit()
+
+    def pobierz(self, ad_id, status):
+        """Zwraca (statystyki, liczba_wiadomosci) dla niezmiennego ogłoszenia albo None, gdy trzeba je pobrać z OLX."""
+        if status not in self.statusy_stale:
+            return None
+        with self._lock:
+            wiersz = self._conn.execute("SELECT status, statystyki, liczba_wiadomosci FROM ogloszenia WHERE id = ?", (ad_id,)).fetchone()
+            if wiersz is None or wiersz[0] != status:
+                self.chybienia += 1
+                return None
+            self.trafienia += 1
+        return json.loads(wiersz[1]), wiersz[2]
+
+    def zapisz(self, ad_data, stats, liczba_wiadomosci, nagroda):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ogloszenia VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (ad_data['id'], ad_data.get('status'), ad_data.get('created_at'), ad_data.get('title'), ad_data.get('description'),
+                 ad_data.get('category_id'), json.dumps(stats), liczba_wiadomosci, nagroda, datetime.now(timezone.utc).isoformat()))
+            self._niezatwierdzone += 1
+            if self._niezatwierdzone >= self.COMMIT_CO:
+                self._conn.commit()
+                self._niezatwierdzone = 0
+
+    def uniewaznij(self, ad_ids=None):
+        """Usuwa wskazane wpisy, a bez argumentu - cały cache (pełna przebudowa przy kolejnym skanie)."""
+        with self._lock:
+            if ad_ids is None:
+                self._conn.execute("DELETE FROM ogloszenia")
+            else:
+                self._conn.executemany("DELETE FROM ogloszenia WHERE id = ?", [(int(ad_id),) for ad_id in ad_ids])
+            self._conn.commit()
+
+    def jako_dataframe(self, tylko_stale=True):
+        """Wszystkie zapisane ogłoszenia jako DataFrame (statystyki rozpakowane w SQLite) - wejście dla `columnar.oblicz_nagrody`."""
+        warunek = f"WHERE status IN ({', '.join('?' * len(self.statusy_stale))})" if tylko_stale else ""
+        with self._lock:
+            self._conn.commit()
+            return pd.read_sql_query(f"""
+                SELECT id, status, created_at, tytul, opis, id_kategorii,
+                       COALESCE(json_extract(statystyki, '$.advert_views'), 0) AS advert_views,
+                       COALESCE(json_extract(statystyki, '$.phone_views'), 0) AS phone_views,
+                       COALESCE(json_extract(statystyki, '$.users_observing'), 0) AS users_observing,
+                       liczba_wiadomosci, nagroda
+                FROM ogloszenia {warunek}""", self._conn, params=sorted(self.statusy_stale) if tylko_stale else None)
+
+    def zapisz_nagrody(self, ad_ids, nagrody):
+        """Nadpisuje zapisane nagrody po przeliczeniu z nowymi wagami."""
+        with self._lock:
+            self._conn.executemany("UPDATE ogloszenia SET nagroda = ? WHERE id = ?", [(float(n), int(i)) for i, n in zip(ad_ids, nagrody)])
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM ogloszenia").fetchone()[0]
+
+    def zamknij(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
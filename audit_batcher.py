@@ -0,0 +1,102 @@
+import json
+
+from tqdm import tqdm
+
+from llm_dispatcher import szacuj_tokeny_tekstu
+
+NAGLOWEK_AUDYTU = "Oceń poniższe wyniki kategoryzacji i zwróć listę JSON w wymaganym formacie:\n\n"
+
+
+class AuditBatcher:
+    """Audyt ogłoszeń paczkami planowanymi według budżetu tokenów, bez gubienia ogłoszeń.
+
+    Pozycje to pary (ID ogłoszenia, blok tekstu w prompcie). Paczka rośnie, dopóki szacowane
+    tokeny promptu i odpowiedzi mieszczą się w `budzet_tokenow` (najwyżej `max_paczka` pozycji).
+    Gdy odpowiedź nie zawiera części ID, ponawiane są tylko brakujące ogłoszenia; gdy paczka
+    przepada w całości (błąd API, nieczytelny JSON), jest dzielona na pół i ponawiana.
+    Ogłoszenie bez wyniku po `max_prob` próbach trafia do `nieudane` i nie jest oznaczane jako audytowane.
+    """
+
+    def __init__(self, dispatcher, model, system_prompt, parsuj_wynik, budzet_tokenow=12000, tokeny_odpowiedzi=60,
+                 max_paczka=50, max_prob=3, timeout=400):
+        self.dispatcher = dispatcher
+        self.model = model
+        self.system_prompt = system_prompt
+        self.parsuj_wynik = parsuj_wynik  # element 'wyniki_audytu' -> słownik wyniku albo None, gdy niekompletny
+        self.budzet_tokenow = budzet_tokenow
+        self.tokeny_odpowiedzi = tokeny_odpowiedzi
+        self.max_paczka = max_paczka
+        self.max_prob = max_prob
+        self.timeout = timeout
+        self.wywolania = 0
+        self.ponowienia = 0
+        self.nieudane = []
+        self._koszt_staly = szacuj_tokeny_tekstu(system_prompt) + szacuj_tokeny_tekstu(NAGLOWEK_AUDYTU)
+
+    def zaplanuj(self, pozycje):
+        """Dzieli pozycje na paczki mieszczące się w budżecie tokenów (za duża pozycja idzie sama)."""
+        paczki, paczka, tokeny = [], [], self._koszt_staly
+        for pozycja in pozycje:
+            koszt = szacuj_tokeny_tekstu(pozycja[1]) + self.tokeny_odpowiedzi
+            if paczka and (tokeny + koszt > self.budzet_tokenow or len(paczka) >= self.max_paczka):
+                paczki.append(paczka)
+                paczka, tokeny = [], self._koszt_staly
+            paczka.append(pozycja)
+            tokeny += koszt
+        if paczka: paczki.append(paczka)
+        return paczki
+
+    def _zapytanie(self, paczka):
+        user_prompt = NAGLOWEK_AUDYTU + "".join(blok for _, blok in paczka)
+        return dict(model=self.model, response_format={"type": "json_object"}, messages=[{"role": "system", "content": self.system_prompt}, {"role": "user", "content": user_prompt}],
+                    temperature=0.0, timeout=self.timeout)
+
+    def _odbierz(self, paczka, zapytanie, future):
+        """Zwraca (wyniki wg ID, czy paczka przepadła w całości)."""
+        try:
+            audyt_dane = json.loads(future.result().choices[0].message.content.strip())
+        except Exception as e:
+            self.dispatcher.odrzuc(zapytanie)
+            print(f" -> KRYTYCZNY BŁĄD podczas audytu paczki ({len(paczka)} ogł.): {e}")
+            return {}, True
+        po_id = {str(id_ogloszenia): id_ogloszenia for id_ogloszenia, _ in paczka}
+        wyniki = {}
+        for item in audyt_dane.get('wyniki_audytu', []) if isinstance(audyt_dane, dict) else []:
+            if isinstance(item, dict) and str(item.get('id_ogloszenia')) in po_id:
+                wynik = self.parsuj_wynik(item)
+                if wynik is not None: wyniki[po_id[str(item['id_ogloszenia'])]] = wynik
+        if len(wyniki) < len(paczka): self.dispatcher.odrzuc(zapytanie)
+        return wyniki, not wyniki
+
+    def audytuj(self, pozycje, przy_paczce, opis="Audyt AI", postep=True):
+        """Audytuje wszystkie pozycje; `przy_paczce(ids, wyniki)` dostaje wyniki każdej odebranej paczki."""
+        proby, kolejka = {}, self.zaplanuj(pozycje)
+        with tqdm(total=len(pozycje), desc=opis, disable=not postep) as pbar:
+            while kolejka:
+                self.wywolania += len(kolejka)
+                nastepna, zapytania = [], [self._zapytanie(p) for p in kolejka]
+                for paczka, zapytanie, future in zip(kolejka, zapytania, self.dispatcher.map(zapytania)):
+                    wyniki, przepadla = self._odbierz(paczka, zapytanie, future)
+                    if wyniki:
+                        przy_paczce([id_ogloszenia for id_ogloszenia, _ in paczka if id_ogloszenia in wyniki], wyniki)
+                        pbar.update(len(wyniki))
+
+                    do_ponowienia = []
+                    for pozycja in paczka:
+                        if pozycja[0] in wyniki: continue
+                        proby[pozycja[0]] = proby.get(pozycja[0], 0) + 1
+                        if proby[pozycja[0]] < self.max_prob:
+                            do_ponowienia.append(pozycja)
+                        else:
+                            self.nieudane.append(pozycja[0])
+                            pbar.update(1)
+                    if not do_ponowienia: continue
+                    self.ponowienia += len(do_ponowienia)
+                    if przepadla and len(do_ponowienia) > 1:
+                        polowa = len(do_ponowienia) // 2
+                        nastepna.extend([do_ponowienia[:polowa], do_ponowienia[polowa:]])
+                    else:
+                        nastepna.extend(self.zaplanuj(do_ponowienia))
+                kolejka = nastepna
+        if self.nieudane:
+            print(f" -> UWAGA: {len(self.nieudane)} ogłoszeń bez wyniku audytu po {self.max_prob} próbach - etap pozostanie niezakończony, a kolejne uruchomienie ponowi tylko je.")
@@ -0,0 +1,61 @@
+"""Benchmark dyspozytora LLM na lokalnym serwerze udającym OpenAI.
+
+Uruchomienie: python benchmarks/benchmark_llm.py --zapytania 200 --latency 0.5 --watki 8
+Wysyła paczki audytowe jedną po drugiej oraz przez LlmDispatcher i porównuje przepustowość.
+"""
+import argparse
+import os
+import sys
+import time
+
+import openai
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_dispatcher import LlmDispatcher  # noqa: E402
+from mock_openai import MockOpenAIServer  # noqa: E402
+
+SYSTEM_PROMPT = """Jesteś ostatecznym audytorem jakości. Odpowiedź MUSI być obiektem JSON z kluczem "wyniki_audytu", zawierającym listę obiektów: {"id_ogloszenia": int, "ocena_pewnosci": int, "uzasadnienie": "..."}."""
+
+
+def zbuduj_zapytania(liczba, rozmiar_paczki=25):
+    zapytania = []
+    for nr in range(liczba):
+        dane = "".join(f"---\nID Ogłoszenia: {nr * rozmiar_paczki + i}\nTytuł: Produkt {i}\nOpis: Opis produktu {i}\nOSTATECZNA KATEGORIA: Dom > Meble\n" for i in range(rozmiar_paczki))
+        zapytania.append(dict(model="gpt-4o", response_format={"type": "json_object"}, messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": dane}], temperature=0.0, timeout=60))
+    return zapytania
+
+
+def zmierz(client, zapytania, watki, rpm, tpm):
+    dispatcher = LlmDispatcher(client, max_workers=watki, rpm=rpm, tpm=tpm, backoff=0.05)
+    start = time.perf_counter()
+    odpowiedzi = [f.result().choices[0].message.content for f in dispatcher.map(zapytania)]
+    czas = time.perf_counter() - start
+    dispatcher.zamknij()
+    return odpowiedzi, czas, dispatcher.raport()
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--zapytania', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.2, help="Opóźnienie serwera na zapytanie (s)")
+    parser.add_argument('--bledy', type=float, default=0.0, help="Odsetek odpowiedzi 429/503 zwracanych przez serwer")
+    parser.add_argument('--watki', type=int, default=8)
+    parser.add_argument('--rpm', type=float, default=6000)
+    parser.add_argument('--tpm', type=float, default=10_000_000)
+    args = parser.parse_args()
+
+    zapytania = zbuduj_zapytania(args.zapytania)
+    with MockOpenAIServer(latency=args.latency, error_rate=args.bledy) as serwer:
+        client = openai.OpenAI(api_key='benchmark', base_url=f"{serwer.url}/v1")
+        wyniki = {nazwa: zmierz(client, zapytania, watki, args.rpm, args.tpm) for nazwa, watki in [("szeregowo", 1), ("dispatcher", args.watki)]}
+
+    print("=" * 60)
+    for nazwa, (_, czas, raport) in wyniki.items():
+        print(f"{nazwa:>12}: {czas:6.2f} s, {args.zapytania / czas:6.1f} zapytań/s, {raport['tokeny_na_minute']:.0f} tokenów/min, ponowień: {raport['ponowienia']}")
+    print(f"Odpowiedzi w tej samej kolejności: {'TAK' if wyniki['szeregowo'][0] == wyniki['dispatcher'][0] else 'NIE'}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main_benchmark()
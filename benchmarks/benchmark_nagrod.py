@@ -0,0 +1,86 @@
+"""Benchmark kolumnowego liczenia nagród i czyszczenia opisów na ogłoszeniach z cache.
+
+Uruchomienie: python benchmarks/benchmark_nagrod.py --ogloszenia 300000 --warianty 50
+(albo --cache cache_ogloszen.sqlite, żeby użyć prawdziwego cache z Etapu 1).
+Porównuje pętlę `calculate_reward`/`czysc_opis` z wersją kolumnową, sprawdza zgodność wyników
+i mierzy przegląd wielu wariantów WEIGHTS.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Benchmark działa bez prawdziwych kluczy - podstawiamy konfigurację przed importem main.
+sys.modules.setdefault('config', types.SimpleNamespace(OPENAI_API_KEY=None, OLX_ACCESS_TOKEN='benchmark'))
+
+import main  # noqa: E402
+from advert_cache import AdvertCache  # noqa: E402
+from columnar import czysc_opisy, oblicz_nagrody, przeszukaj_wagi, wiek_w_dniach  # noqa: E402
+from mock_olx import generuj_ogloszenia  # noqa: E402
+
+
+def zbuduj_cache(sciezka, liczba):
+    cache = AdvertCache(sciezka, main.STATUSY_ZAKONCZONE)
+    for ad in generuj_ogloszenia(liczba):
+        ad['status'] = main.STATUSY_ZAKONCZONE[ad['id'] % 2]
+        cache.zapisz(ad, ad['_stats'], sum(ad['_threads']), 0.0)
+    return cache
+
+
+def warianty_wag(liczba, seed=0):
+    rng = random.Random(seed)
+    return [{klucz: waga * rng.uniform(0.5, 2.0) for klucz, waga in main.WEIGHTS.items()} for _ in range(liczba)]
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ogloszenia', type=int, default=100000)
+    parser.add_argument('--cache', help="Istniejący plik cache ogłoszeń (zamiast syntetycznych danych)")
+    parser.add_argument('--warianty', type=int, default=50, help="Ile wariantów WEIGHTS przeliczyć")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as katalog:
+        start = time.perf_counter()
+        cache = AdvertCache(args.cache, main.STATUSY_ZAKONCZONE) if args.cache else zbuduj_cache(os.path.join(katalog, 'cache.sqlite'), args.ogloszenia)
+        df = cache.jako_dataframe()
+        cache.zamknij()
+    print(f"Wczytano {len(df)} ogłoszeń z cache w {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    wiek = wiek_w_dniach(df['created_at'])
+    petla = np.array([main.calculate_reward({'advert_views': w, 'phone_views': t, 'users_observing': o}, m, d)
+                      for w, t, o, m, d in zip(df['advert_views'], df['phone_views'], df['users_observing'], df['liczba_wiadomosci'], wiek)])
+    czas_petli = time.perf_counter() - start
+    start = time.perf_counter()
+    kolumnowo = oblicz_nagrody(df, main.WEIGHTS, main.MIN_AD_AGE_DAYS)
+    czas_kolumnowo = time.perf_counter() - start
+
+    wagi = warianty_wag(args.warianty)
+    start = time.perf_counter()
+    wybrane = przeszukaj_wagi(df, wagi, main.MIN_REWARD_SCORE, main.MIN_AD_AGE_DAYS)
+    czas_przegladu = time.perf_counter() - start
+
+    start = time.perf_counter()
+    opisy_petla = [main.czysc_opis(o, t) for o, t in zip(df['opis'], df['tytul'])]
+    czas_opisow_petla = time.perf_counter() - start
+    start = time.perf_counter()
+    opisy = czysc_opisy(df['opis'], df['tytul'])
+    czas_opisow = time.perf_counter() - start
+
+    print("\n" + "="*60)
+    print(f"Nagrody (pętla):        {czas_petli:7.3f} s")
+    print(f"Nagrody (kolumnowo):    {czas_kolumnowo:7.3f} s, zgodne: {'TAK' if np.allclose(petla, kolumnowo) else 'NIE'}")
+    print(f"Przegląd {args.warianty} wariantów:  {czas_przegladu:7.3f} s, wybranych: {min(wybrane)}-{max(wybrane)}")
+    print(f"Opisy (pętla):          {czas_opisow_petla:7.3f} s")
+    print(f"Opisy (kolumnowo):      {czas_opisow:7.3f} s, zgodne: {'TAK' if opisy.tolist() == opisy_petla else 'NIE'}")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,115 @@
+"""Offline benchmark lokalnego preklasyfikatora kategorii (bez sieci i bez OpenAI).
+
+Uruchomienie na prawdziwych danych: python benchmarks/benchmark_preklasyfikatora.py --kategorie kategorie.json --ogloszenia checkpointy/etap1.jsonl
+Na danych syntetycznych:           python benchmarks/benchmark_preklasyfikatora.py --syntetyczne 2000
+
+Dla każdego ogłoszenia sprawdza decyzję preklasyfikatora względem oryginalnego 'ID Kategorii':
+trafność decyzji bez LLM, odsetek ogłoszeń, których kategoria została wśród kandydatów, oraz ile
+decyzji LLM (węzłów na ścieżce z więcej niż jedną opcją) i opcji w promptach oszczędza zawężenie.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import types
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Benchmark działa bez prawdziwych kluczy - podstawiamy konfigurację przed importem main.
+sys.modules.setdefault('config', types.SimpleNamespace(OPENAI_API_KEY=None, OLX_ACCESS_TOKEN='benchmark'))
+
+import main  # noqa: E402
+from categorizer import HierarchicalCategorizer  # noqa: E402
+from category_index import CategoryIndex  # noqa: E402
+from preclassifier import CategoryPreclassifier  # noqa: E402
+from mock_olx import generuj_kategorie, generuj_ogloszenia  # noqa: E402
+
+
+def wczytaj_ogloszenia(sciezka):
+    """Wiersze Etapu 1 z punktu kontrolnego (.jsonl) albo z raportu CSV."""
+    if sciezka.endswith('.jsonl'):
+        with open(sciezka, 'r', encoding='utf-8') as f:
+            return pd.DataFrame([json.loads(linia) for linia in f if linia.strip()])
+    return pd.read_csv(sciezka, sep=';', encoding='utf-8-sig')
+
+
+def sciezka_decyzji(kategoryzator, lisc):
+    """Węzły, w których zapada decyzja na drodze od korzenia do liścia: [(węzeł, następnik), ...]."""
+    przodkowie = (kategoryzator.KORZEN,) + kategoryzator.indeks.przodkowie(lisc)
+    return list(zip(przodkowie, przodkowie[1:] + (lisc,)))
+
+
+def ocen(indeks, df, top_k, prog):
+    preklasyfikator = CategoryPreclassifier(indeks, top_k=top_k, prog_pewnosci=prog)
+    kategoryzator = HierarchicalCategorizer(None, None, indeks)
+    s = dict(ogloszenia=0, bezposrednie=0, bezposrednie_trafne=0, kandydaci_trafni=0, zawezone=0,
+             decyzje_bazowe=0, decyzje=0, opcje_bazowe=0, opcje=0)
+    start = time.perf_counter()
+    for _, wiersz in df.iterrows():
+        prawdziwy = int(wiersz['ID Kategorii'])
+        if prawdziwy not in indeks: continue
+        s['ogloszenia'] += 1
+        sciezka = sciezka_decyzji(kategoryzator, prawdziwy)
+        for wezel, _ in sciezka:
+            s['decyzje_bazowe'] += 1
+            s['opcje_bazowe'] += len(kategoryzator.dzieci(wezel))
+
+        lisc, kandydaci = preklasyfikator.klasyfikuj(wiersz['Tytuł'], main.czysc_opis(wiersz['Opis'], wiersz['Tytuł']))
+        if lisc is not None:
+            s['bezposrednie'] += 1
+            s['bezposrednie_trafne'] += lisc == prawdziwy
+            continue
+        s['zawezone'] += 1
+        s['kandydaci_trafni'] += kandydaci is None or prawdziwy in kandydaci
+        # Zakładamy, że LLM wybiera poprawnie, dopóki prawdziwa ścieżka jest wśród opcji.
+        for wezel, nastepnik in sciezka:
+            dzieci = kategoryzator.dozwolone_dzieci(wezel, kandydaci)
+            if len(dzieci) > 1:
+                s['decyzje'] += 1
+                s['opcje'] += len(dzieci)
+            if nastepnik not in dzieci: break
+    s['czas_s'] = time.perf_counter() - start
+    return s
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kategorie', help="Plik kategorii (jak PLIK_KATEGORII)")
+    parser.add_argument('--ogloszenia', help="Wiersze Etapu 1: checkpointy/etap1.jsonl lub CSV z kolumnami 'Tytuł', 'Opis', 'ID Kategorii'")
+    parser.add_argument('--syntetyczne', type=int, default=0, help="Zamiast plików wygeneruj tyle syntetycznych ogłoszeń")
+    parser.add_argument('--top-k', type=int, nargs='+', default=[main.PREKLASYFIKATOR_TOP_K])
+    parser.add_argument('--prog', type=float, nargs='+', default=[main.PREKLASYFIKATOR_PROG_PEWNOSCI])
+    args = parser.parse_args()
+
+    if args.syntetyczne:
+        kategorie = generuj_kategorie()
+        indeks = CategoryIndex.z_listy(kategorie)
+        liscie = [kat['id'] for kat in kategorie if kat['is_leaf']]
+        ogloszenia = generuj_ogloszenia(args.syntetyczne, kategorie_ids=liscie, nazwy_kategorii={kat['id']: kat['name'] for kat in kategorie})
+        df = pd.DataFrame({'Tytuł': [ad['title'] for ad in ogloszenia], 'Opis': [ad['description'] for ad in ogloszenia],
+                           'ID Kategorii': [ad['category_id'] for ad in ogloszenia]})
+    elif args.kategorie and args.ogloszenia:
+        indeks, df = CategoryIndex.wczytaj(args.kategorie), wczytaj_ogloszenia(args.ogloszenia)
+    else:
+        parser.error("podaj --kategorie i --ogloszenia albo --syntetyczne N")
+
+    print(f"{len(indeks)} kategorii, {len(df)} ogłoszeń")
+    print("=" * 100)
+    print(f"{'top_k':>5} {'próg':>5} | {'bez LLM':>8} {'trafność':>9} | {'kandydaci OK':>12} | {'decyzje LLM/ogł.':>17} {'opcje/prompt':>13} | {'czas':>7}")
+    for top_k in args.top_k:
+        for prog in args.prog:
+            s = ocen(indeks, df, top_k, prog)
+            n = max(1, s['ogloszenia'])
+            trafnosc = s['bezposrednie_trafne'] / s['bezposrednie'] if s['bezposrednie'] else 0.0
+            kandydaci = s['kandydaci_trafni'] / s['zawezone'] if s['zawezone'] else 0.0
+            opcje_bazowe = s['opcje_bazowe'] / max(1, s['decyzje_bazowe'])
+            opcje = s['opcje'] / max(1, s['decyzje'])
+            print(f"{top_k:>5} {prog:>5.2f} | {s['bezposrednie'] / n:>8.1%} {trafnosc:>9.1%} | {kandydaci:>12.1%} | "
+                  f"{s['decyzje_bazowe'] / n:>6.2f} -> {s['decyzje'] / n:<6.2f}   {opcje_bazowe:>5.1f} -> {opcje:<5.1f} | {s['czas_s']:>6.2f}s")
+    print("=" * 100)
+
+
+if __name__ == "__main__":
+    main_benchmark()
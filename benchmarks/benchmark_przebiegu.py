@@ -0,0 +1,141 @@
+"""Benchmark całego przebiegu `main()` na lokalnych serwerach udających OLX i OpenAI.
+
+Uruchomienie: python benchmarks/benchmark_przebiegu.py --skala 10k --latency-olx 0.005 --latency-ai 0.2 --wynik wynik.json
+Generuje drzewo kategorii i ogłoszenia (1k/10k/100k), uruchamia `main()` w katalogu tymczasowym
+i dla każdego etapu podaje czas, przepustowość, szczyt pamięci i liczbę zapytań do obu serwerów.
+Nieznane argumenty trafiają do `main()`, np. --strumieniowo albo --bez-cache-llm.
+Raport JSON (--wynik) zawiera też telemetrię przebiegu, więc kolejne uruchomienia można porównywać.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+import openai
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Benchmark działa bez prawdziwych kluczy - podstawiamy konfigurację przed importem main.
+sys.modules.setdefault('config', types.SimpleNamespace(OPENAI_API_KEY='benchmark', OLX_ACCESS_TOKEN='benchmark'))
+
+import main  # noqa: E402
+from limiter import TokenBucket  # noqa: E402
+from llm_dispatcher import LlmDispatcher  # noqa: E402
+from olx_client import OlxClient  # noqa: E402
+from mock_olx import MockOlxServer, generuj_kategorie, generuj_ogloszenia  # noqa: E402
+from mock_openai import MockOpenAIServer  # noqa: E402
+
+SKALE = {'1k': 1000, '10k': 10000, '100k': 100000}
+ETAPY = ['etap1_skanuj_i_filtruj', 'etap2_reklasyfikuj_z_audytem', 'etap3_ostateczna_weryfikacja', 'uruchom_strumieniowo']
+
+
+def roznica(po, przed):
+    return {k: v - przed.get(k, 0) for k, v in po.items() if v != przed.get(k, 0)}
+
+
+def mierz_etapy(serwer_olx, serwer_ai, pomiary):
+    """Podmienia funkcje etapów w `main` na wersje zapisujące czas, szczyt pamięci i zapytania do serwerów."""
+    for nazwa in ETAPY:
+        funkcja = getattr(main, nazwa)
+
+        def mierzona(*args, _funkcja=funkcja, _nazwa=nazwa, **kwargs):
+            olx_przed, ai_przed = dict(serwer_olx.liczniki), dict(serwer_ai.liczniki)
+            if tracemalloc.is_tracing(): tracemalloc.reset_peak()
+            start = time.perf_counter()
+            wynik = _funkcja(*args, **kwargs)
+            czas = time.perf_counter() - start
+            wejscie = len(args[0]) if _nazwa in ('etap2_reklasyfikuj_z_audytem', 'etap3_ostateczna_weryfikacja') else None
+            pomiary.append({
+                'etap': _nazwa, 'czas_s': czas, 'wejscie': wejscie, 'wyjscie': len(wynik) if wynik is not None else None,
+                'szczyt_pamieci_mb': tracemalloc.get_traced_memory()[1] / 2**20 if tracemalloc.is_tracing() else None,
+                'olx': roznica(serwer_olx.liczniki, olx_przed), 'openai': roznica(serwer_ai.liczniki, ai_przed),
+            })
+            return wynik
+        setattr(main, nazwa, mierzona)
+
+
+def przepustowosc(pomiar, liczba_ogloszen):
+    """Ogłoszeń na sekundę: Etap 1 i tryb strumieniowy liczone od wszystkich ogłoszeń, pozostałe od swojego wejścia."""
+    przetworzone = pomiar['wejscie'] if pomiar['wejscie'] is not None else liczba_ogloszen
+    return przetworzone / pomiar['czas_s'] if pomiar['czas_s'] else 0.0
+
+
+def wypisz_pomiary(pomiary, liczba_ogloszen, czas, szczyt_rss_mb):
+    print("\n" + "="*100)
+    print(f"{'etap':<30} {'czas [s]':>9} {'ogł./s':>9} {'wyjście':>8} {'pamięć [MB]':>12} {'OLX':>8} {'OpenAI':>8}  zapytania OLX")
+    for p in pomiary:
+        pamiec = f"{p['szczyt_pamieci_mb']:.1f}" if p['szczyt_pamieci_mb'] is not None else '-'
+        olx = {k: v for k, v in p['olx'].items() if k != 'bledy'}  # Odpowiedzi z wstrzykniętym błędem liczone osobno
+        print(f"{p['etap']:<30} {p['czas_s']:>9.2f} {przepustowosc(p, liczba_ogloszen):>9.1f} {p['wyjscie'] if p['wyjscie'] is not None else '-':>8} {pamiec:>12} "
+              f"{sum(olx.values()):>8} {p['openai'].get('chat_completions', 0):>8}  {p['olx']}")
+    print(f"Cały przebieg: {czas:.2f} s, {liczba_ogloszen / czas:.1f} ogł./s, szczyt RSS procesu: {szczyt_rss_mb:.0f} MB")
+    print("="*100)
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--skala', choices=SKALE, default='1k', help="Liczba ogłoszeń na serwerze OLX")
+    parser.add_argument('--ogloszenia', type=int, help="Dowolna liczba ogłoszeń (zamiast --skala)")
+    parser.add_argument('--kategorie', default='8,6,5', help="Liczba dzieci na kolejnych poziomach drzewa kategorii")
+    parser.add_argument('--latency-olx', type=float, default=0.0, help="Opóźnienie serwera OLX na zapytanie (s)")
+    parser.add_argument('--latency-ai', type=float, default=0.05, help="Opóźnienie serwera OpenAI na zapytanie (s)")
+    parser.add_argument('--bledy-olx', type=float, default=0.0, help="Odsetek odpowiedzi 429/503 serwera OLX")
+    parser.add_argument('--bledy-ai', type=float, default=0.0, help="Odsetek odpowiedzi 429/503 serwera OpenAI")
+    parser.add_argument('--rps', type=float, default=2000, help="Budżet zapytań do OLX na sekundę")
+    parser.add_argument('--pamiec', action='store_true', help="Mierz szczyt pamięci etapów przez tracemalloc (spowalnia przebieg)")
+    parser.add_argument('--cicho', action='store_true', help="Nie pokazuj wyjścia main()")
+    parser.add_argument('--wynik', help="Zapisz pomiary i telemetrię do pliku JSON")
+    parser.add_argument('--seed', type=int, default=0)
+    args, argumenty_main = parser.parse_known_args()
+
+    liczba = args.ogloszenia or SKALE[args.skala]
+    kategorie = generuj_kategorie(tuple(int(x) for x in args.kategorie.split(',')), seed=args.seed)
+    liscie = [k['id'] for k in kategorie if k['is_leaf']]
+    ogloszenia = generuj_ogloszenia(liczba, liscie, seed=args.seed, nazwy_kategorii={k['id']: k['name'] for k in kategorie})
+    print(f"Wygenerowano {len(kategorie)} kategorii ({len(liscie)} liści) i {liczba} ogłoszeń.")
+
+    main.MAX_ADS_TO_PROCESS = 0
+    pomiary, katalog_startowy = [], os.getcwd()
+    with tempfile.TemporaryDirectory() as katalog, \
+            MockOlxServer(ogloszenia, latency=args.latency_olx, error_rate=args.bledy_olx, seed=args.seed) as serwer_olx, \
+            MockOpenAIServer(latency=args.latency_ai, error_rate=args.bledy_ai, seed=args.seed) as serwer_ai:
+        with open(os.path.join(katalog, main.PLIK_KATEGORII), 'w', encoding='utf-8') as f:
+            json.dump(kategorie, f, ensure_ascii=False)
+        main.OLX_LIMITER = TokenBucket(args.rps)
+        main.OLX_CLIENT = OlxClient(serwer_olx.url, main.OLX_HEADERS, limiter=main.OLX_LIMITER, pool_size=main.MAX_CONCURRENT_REQUESTS,
+                                    backoff=0.05, telemetria=main.TELEMETRIA)
+        main.OPENAI_CLIENT = openai.OpenAI(api_key='benchmark', base_url=f"{serwer_ai.url}/v1", max_retries=0)
+        main.LLM_DISPATCHER = LlmDispatcher(main.OPENAI_CLIENT, max_workers=main.LLM_MAX_ROWNOLEGLYCH, rpm=1_000_000, tpm=1e12,
+                                            backoff=0.05, telemetria=main.TELEMETRIA)
+        mierz_etapy(serwer_olx, serwer_ai, pomiary)
+
+        if args.pamiec: tracemalloc.start()
+        os.chdir(katalog)
+        start = time.perf_counter()
+        try:
+            with open(os.devnull, 'w') as nic, contextlib.redirect_stdout(nic if args.cicho else sys.stdout):
+                main.main(argumenty_main)
+        finally:
+            czas = time.perf_counter() - start
+            os.chdir(katalog_startowy)
+            if args.pamiec: tracemalloc.stop()
+        main.LLM_DISPATCHER.zamknij()
+        liczniki = {'olx': dict(serwer_olx.liczniki), 'openai': dict(serwer_ai.liczniki), 'tokeny_openai': serwer_ai.tokeny}
+
+    szczyt_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux podaje KB
+    wypisz_pomiary(pomiary, liczba, czas, szczyt_rss_mb)
+    if args.wynik:
+        with open(args.wynik, 'w', encoding='utf-8') as f:
+            json.dump({'parametry': vars(args), 'argumenty_main': argumenty_main, 'ogloszenia': liczba, 'kategorie': len(kategorie),
+                       'czas_s': czas, 'szczyt_rss_mb': szczyt_rss_mb, 'etapy': pomiary, 'liczniki_serwerow': liczniki,
+                       'telemetria': main.TELEMETRIA.raport()}, f, ensure_ascii=False, indent=2)
+        print(f"Zapisano wynik do '{args.wynik}'.")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,58 @@
+"""Benchmark Etapu 1 na lokalnym serwerze udającym OLX.
+
+Uruchomienie: python benchmarks/benchmark_skanowania.py --ogloszenia 2000 --latency 0.02 --rps 200
+Porównuje skanowanie jednym wątkiem z wersją współbieżną i sprawdza, że wyniki są identyczne.
+"""
+import argparse
+import os
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Benchmark działa bez prawdziwych kluczy - podstawiamy konfigurację przed importem main.
+sys.modules.setdefault('config', types.SimpleNamespace(OPENAI_API_KEY=None, OLX_ACCESS_TOKEN='benchmark'))
+
+import main  # noqa: E402
+from category_index import CategoryIndex  # noqa: E402
+from limiter import TokenBucket  # noqa: E402
+from olx_client import OlxClient  # noqa: E402
+from mock_olx import MockOlxServer, generuj_ogloszenia  # noqa: E402
+
+
+def zmierz(url, watki, prefetch, rps):
+    main.MAX_CONCURRENT_REQUESTS = watki
+    main.PAGES_PREFETCH = prefetch
+    main.OLX_LIMITER = TokenBucket(rps)
+    main.OLX_CLIENT = OlxClient(url, main.OLX_HEADERS, limiter=main.OLX_LIMITER, pool_size=watki, backoff=0.05)
+    start = time.perf_counter()
+    df = main.etap1_skanuj_i_filtruj(CategoryIndex.z_listy([]))
+    return df, time.perf_counter() - start
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ogloszenia', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.02, help="Opóźnienie serwera na zapytanie (s)")
+    parser.add_argument('--rps', type=float, default=200, help="Budżet zapytań na sekundę dla limitera")
+    parser.add_argument('--bledy', type=float, default=0.0, help="Odsetek odpowiedzi 429/503 zwracanych przez serwer")
+    parser.add_argument('--watki', type=int, default=main.MAX_CONCURRENT_REQUESTS)
+    args = parser.parse_args()
+
+    main.MAX_ADS_TO_PROCESS = 0
+    with MockOlxServer(generuj_ogloszenia(args.ogloszenia), latency=args.latency, error_rate=args.bledy) as serwer:
+        wyniki = {}
+        for nazwa, watki, prefetch in [("szeregowo", 1, 1), ("współbieżnie", args.watki, main.PAGES_PREFETCH)]:
+            df, czas = zmierz(serwer.url, watki, prefetch, args.rps)
+            wyniki[nazwa] = (df, czas)
+
+    print("\n" + "="*60)
+    for nazwa, (df, czas) in wyniki.items():
+        print(f"{nazwa:>14}: {czas:7.2f} s, {args.ogloszenia / czas:8.1f} ogł./s, {len(df)} wybranych")
+    identyczne = wyniki["szeregowo"][0].equals(wyniki["współbieżnie"][0])
+    print(f"Wyniki identyczne: {'TAK' if identyczne else 'NIE'}")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,84 @@
+"""Lokalny serwer udający OLX Partner API (/adverts, /statistics, /threads) na potrzeby benchmarków."""
+import random
+from datetime import datetime, timedelta
+
+from mock_serwer import MockSerwer
+
+STATUSY = ['active', 'removed_by_user', 'outdated', 'limited']
+_SYLABY = ['ka', 'ro', 'me', 'li', 'sto', 'par', 'wik', 'do', 'mor', 'ten', 'zy', 'bal', 'gra', 'nek', 'tu', 'pol']
+
+
+def _slowo(rng):
+    return "".join(rng.choice(_SYLABY) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def generuj_kategorie(szerokosci=(8, 6, 5), seed=0):
+    """Deterministycznie generuje drzewo kategorii w formacie pliku kategorie.json (lista słowników).
+
+    `szerokosci` to liczba dzieci na kolejnych poziomach, np. (8, 6, 5) daje 8 * 6 * 5 = 240 liści.
+    """
+    rng = random.Random(seed)
+    kategorie, poziom, nastepne_id = [], [0], 1
+    for glebokosc, szerokosc in enumerate(szerokosci):
+        nowy_poziom = []
+        for rodzic in poziom:
+            for _ in range(szerokosc):
+                kategorie.append({'id': nastepne_id, 'name': f"{_slowo(rng)} {_slowo(rng).lower()}", 'parent_id': rodzic,
+                                  'is_leaf': glebokosc == len(szerokosci) - 1})
+                nowy_poziom.append(nastepne_id)
+                nastepne_id += 1
+        poziom = nowy_poziom
+    return kategorie
+
+
+def generuj_ogloszenia(liczba, kategorie_ids=(1,), seed=0, nazwy_kategorii=None):
+    """Deterministycznie generuje ogłoszenia wraz ze statystykami i liczbą wiadomości w wątkach.
+
+    Z `nazwy_kategorii` (ID -> nazwa) tytuł i opis zawierają nazwę kategorii ogłoszenia z dodatkowymi słowami.
+    """
+    rng = random.Random(seed)
+    teraz = datetime.now()
+    ogloszenia = []
+    for i in range(1, liczba + 1):
+        wiek = rng.randint(1, 120)
+        kategoria = rng.choice(kategorie_ids)
+        produkt = f"{nazwy_kategorii[kategoria]} {_slowo(rng).lower()}" if nazwy_kategorii else "Produkt testowy"
+        ogloszenia.append({
+            'id': 100000 + i,
+            'title': f"{produkt} {i}",
+            'description': f"{produkt} {i}. Opis produktu numer {i}. W razie pytań lub wątpliwości prosimy o kontakt.",
+            'category_id': kategoria,
+            'status': rng.choice(STATUSY),
+            'created_at': (teraz - timedelta(days=wiek)).strftime('%Y-%m-%d %H:%M:%S'),
+            '_stats': {'advert_views': rng.randint(0, 500), 'phone_views': rng.randint(0, 20), 'users_observing': rng.randint(0, 10)},
+            '_threads': [rng.randint(1, 6) for _ in range(rng.choice([0, 0, 1, 3, 60]))],
+        })
+    return ogloszenia
+
+
+class MockOlxServer(MockSerwer):
+    """Udaje /adverts, /adverts/{id}/statistics i /threads na podstawie listy wygenerowanych ogłoszeń."""
+
+    def __init__(self, ogloszenia, **kwargs):
+        super().__init__(**kwargs)
+        self.ogloszenia = ogloszenia
+        self.po_id = {ad['id']: ad for ad in ogloszenia}
+
+    def obsluz(self, metoda, sciezka, query, body):
+        offset, limit = int(query.get('offset', 0)), int(query.get('limit', 50))
+        czesci = [c for c in sciezka.split('/') if c]
+
+        if czesci[-1] == 'adverts':
+            self.policz('adverts')
+            strona = self.ogloszenia[offset:offset + limit]
+            return 200, {'data': [{k: v for k, v in ad.items() if not k.startswith('_')} for ad in strona]}
+        if czesci[-1] == 'statistics':
+            self.policz('statistics')
+            ad = self.po_id.get(int(czesci[-2]))
+            return (200, {'data': ad['_stats']}) if ad else (404, {'error': 'not found'})
+        if czesci[-1] == 'threads':
+            self.policz('threads')
+            ad = self.po_id.get(int(query.get('advert_id', 0)))
+            watki = ad['_threads'][offset:offset + limit] if ad else []
+            return 200, {'data': [{'total_count': n} for n in watki]}
+        return 404, {'error': 'unknown endpoint'}
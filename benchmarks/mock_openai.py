@@ -0,0 +1,63 @@
+"""Lokalny serwer udający endpoint OpenAI /v1/chat/completions na potrzeby benchmarków.
+
+Odpowiedzi są deterministyczne i mają format oczekiwany przez poszczególne etapy:
+wybory kategorii (Etap 2.1), audyt (Etap 2.2 i 3) oraz wybór opcji przy korekcie (Etap 2.3).
+"""
+import hashlib
+import json
+import re
+import time
+
+from mock_serwer import MockSerwer
+
+_OPCJE = re.compile(r'--- OPCJE ---\n(.*?)\n--- KONIEC ---', re.S)
+_ID_OPCJI = re.compile(r'^(\d+):', re.M)
+_PRODUKT = re.compile(r'^Produkt: (\d+)\nTytuł: "(.*)"$', re.M)
+_ID_OGLOSZENIA = re.compile(r'^ID Ogłoszenia: (\d+)$', re.M)
+_OPCJA_A = re.compile(r'^Opcja A: (\d+):', re.M)
+
+
+def _wybierz(tekst, opcje):
+    return opcje[int(hashlib.md5(tekst.encode('utf-8')).hexdigest(), 16) % len(opcje)]
+
+
+def odpowiedz_na_prompt(system, user):
+    """Treść odpowiedzi asystenta dla danego promptu."""
+    opcje_blok = _OPCJE.search(user)
+    opcje = [int(x) for x in _ID_OPCJI.findall(opcje_blok.group(1))] if opcje_blok else []
+    if '"wybory"' in system:
+        return json.dumps({'wybory': [{'produkt': int(nr), 'id': _wybierz(tytul, opcje)} for nr, tytul in _PRODUKT.findall(user)]})
+    if '"wyniki_audytu"' in system:
+        ids = [int(x) for x in _ID_OGLOSZENIA.findall(user)]
+        if 'ocena_pewnosci' in system:
+            return json.dumps({'wyniki_audytu': [{'id_ogloszenia': i, 'ocena_pewnosci': 3 + i % 3, 'uzasadnienie': 'Test.'} for i in ids]})
+        return json.dumps({'wyniki_audytu': [{'id_ogloszenia': i, 'ocena': 'zła' if i % 4 == 0 else 'dobra', 'komentarz': 'Test.'} for i in ids]})
+    opcja_a = _OPCJA_A.search(user)
+    if opcja_a:
+        return opcja_a.group(1)
+    return str(opcje[0]) if opcje else '0'
+
+
+class MockOpenAIServer(MockSerwer):
+    """Udaje POST /v1/chat/completions; podłącz klienta przez `openai.OpenAI(base_url=serwer.url + '/v1')`."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.tokeny = 0
+
+    def obsluz(self, metoda, sciezka, query, body):
+        if metoda != 'POST' or not sciezka.endswith('/chat/completions'):
+            return 404, {'error': {'message': 'unknown endpoint'}}
+        self.policz('chat_completions')
+        wiadomosci = body.get('messages', [])
+        system = next((m['content'] for m in wiadomosci if m['role'] == 'system'), '')
+        user = next((m['content'] for m in wiadomosci if m['role'] == 'user'), '')
+        tresc = odpowiedz_na_prompt(system, user)
+        prompt_tokens, completion_tokens = (len(system) + len(user)) // 4, len(tresc) // 4 + 1
+        with self._lock:
+            self.tokeny += prompt_tokens + completion_tokens
+        return 200, {
+            'id': 'chatcmpl-mock', 'object': 'chat.completion', 'created': int(time.time()), 'model': body.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': tresc}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'total_tokens': prompt_tokens + completion_tokens},
+        }
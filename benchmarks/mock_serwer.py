@@ -0,0 +1,94 @@
+"""Wspólna baza lokalnych serwerów udających zewnętrzne API w benchmarkach."""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class MockSerwer:
+    """Serwer HTTP w osobnym wątku.
+
+    `latency` dodaje opóźnienie (s) do każdej odpowiedzi, a `error_rate` to odsetek
+    zapytań kończonych losowo kodem 429 (z Retry-After) lub 503. Podklasy implementują
+    `obsluz(metoda, sciezka, query, body)` zwracające (status, payload).
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, port=0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.liczniki = {'bledy': 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def policz(self, nazwa):
+        with self._lock:
+            self.liczniki[nazwa] = self.liczniki.get(nazwa, 0) + 1
+
+    def obsluz(self, metoda, sciezka, query, body):
+        raise NotImplementedError
+
+    def _losowy_blad(self):
+        with self._lock:
+            if not (self.error_rate and self._rng.random() < self.error_rate):
+                return None
+            self.liczniki['bledy'] += 1
+            if self._rng.random() < 0.5:
+                return 429, {'error': 'too many requests'}, {'Retry-After': '0'}
+            return 503, {'error': 'service unavailable'}, {}
+
+    def _handler(self):
+        serwer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _odpowiedz(self, status, payload, headers=None):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                for nazwa, wartosc in (headers or {}).items():
+                    self.send_header(nazwa, wartosc)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _obsluz(self, metoda):
+                dlugosc = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(dlugosc)) if dlugosc else None
+                if serwer.latency: time.sleep(serwer.latency)
+                blad = serwer._losowy_blad()
+                if blad:
+                    return self._odpowiedz(*blad)
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                self._odpowiedz(*serwer.obsluz(metoda, url.path, query, body))
+
+            def do_GET(self):
+                self._obsluz('GET')
+
+            def do_POST(self):
+                self._obsluz('POST')
+
+        return Handler
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import re
+import unicodedata
+
+from tqdm import tqdm
+
+SYSTEM_PROMPT_KATEGORYZACJI = """Jesteś nawigatorem kategoryzacji. Dla każdego produktu zawsze wybieraj najbardziej pasującą opcję z listy. Zejdź jak najgłębiej. Odpowiedź MUSI być obiektem JSON z kluczem "wybory", zawierającym listę obiektów: {"produkt": int, "id": int}, gdzie "id" to ID wybranej opcji."""
+
+_NIEALFANUMERYCZNE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def klucz_tresci(tytul, opis):
+    """Skrót znormalizowanego tytułu i opisu - identyczne i prawie identyczne oferty dostają ten sam klucz."""
+    tekst = unicodedata.normalize('NFKC', f"{tytul or ''} {opis or ''}").lower()
+    tekst = _NIEALFANUMERYCZNE.sub(' ', tekst).strip()
+    return hashlib.sha1(tekst.encode('utf-8')).hexdigest()
+
+
+class HierarchicalCategorizer:
+    """Kategoryzacja zstępująca po drzewie kategorii, poziom po poziomie dla wszystkich ogłoszeń naraz.
+
+    Ogłoszenia stojące w tym samym węźle drzewa trafiają do jednego promptu (do `rozmiar_paczki`
+    sztuk), a decyzje są zapamiętywane pod kluczem (skrót treści, ID węzła) - duplikaty ofert
+    nie generują dodatkowych wywołań. Listy opcji budowane są raz na węzeł, a dzieci i ścieżki
+    pochodzą z `CategoryIndex`.
+
+    Opcjonalny `preklasyfikator` (CategoryPreclassifier) przypisuje pewne ogłoszenia od razu do liścia,
+    a pozostałym zawęża opcje do kandydatów; węzeł z jedną możliwą opcją nie wymaga wywołania LLM.
+    """
+
+    KORZEN = 0
+    NAZWA_CHECKPOINTU = 'etap2_1_decyzje'
+
+    def __init__(self, dispatcher, model, indeks_kategorii, rozmiar_paczki=20, timeout=60, checkpoint=None, preklasyfikator=None):
+        self.dispatcher = dispatcher
+        self.model = model
+        self.indeks = indeks_kategorii
+        self.rozmiar_paczki = rozmiar_paczki
+        self.timeout = timeout
+        self.preklasyfikator = preklasyfikator
+        self.decyzje = {}  # (klucz_tresci, id_wezla) -> ID wybranej opcji
+        self.checkpoint = checkpoint
+        if checkpoint is not None:
+            # Decyzje z przerwanego uruchomienia - wznowienie nie powtarza opłaconych wywołań.
+            for klucz, wezel, wybor in checkpoint.wczytaj(self.NAZWA_CHECKPOINTU):
+                self.decyzje[(klucz, wezel)] = wybor
+        self.wywolania_llm = 0
+        self.trafienia_cache = 0
+        self.decyzje_lokalne = 0
+        self._opcje = {}
+
+    def dzieci(self, wezel):
+        if wezel == self.KORZEN: return self.indeks.korzenie()
+        return [] if self.indeks.czy_lisc(wezel) else self.indeks.dzieci(wezel)
+
+    def dozwolone_dzieci(self, wezel, kandydaci=None):
+        """Dzieci węzła zawężone do kandydatów preklasyfikatora (wszystkie, gdy żadne nie jest kandydatem)."""
+        dzieci = self.dzieci(wezel)
+        zawezone = [kat_id for kat_id in dzieci if kat_id in kandydaci] if kandydaci else None
+        return tuple(zawezone or dzieci)
+
+    def opcje(self, dzieci):
+        if dzieci not in self._opcje:
+            self._opcje[dzieci] = "\n".join(f"{kat_id}: {self.indeks.nazwa(kat_id)}" for kat_id in dzieci)
+        return self._opcje[dzieci]
+
+    def sciezka(self, wezel):
+        return '' if wezel == self.KORZEN else self.indeks.sciezka(wezel)
+
+    def kategoryzuj(self, produkty, postep=True):
+        """Przyjmuje listę (tytuł, opis, id_ogłoszenia) i zwraca listę sugerowanych ID (lub kodów błędów) w tej samej kolejności.
+
+        Kody błędów są zgodne z wersją sekwencyjną: 'BŁĄD_ETAP1' przy nieprawidłowej odpowiedzi
+        na pierwszym poziomie (głębiej zostaje ostatni poprawny wybór) i 'BŁĄD_API_1' przy błędzie API.
+        """
+        klucze = [klucz_tresci(tytul, opis) for tytul, opis, _ in produkty]
+        wyniki, kandydaci = [None] * len(produkty), [None] * len(produkty)
+        if self.preklasyfikator is not None:
+            for i, (tytul, opis, _) in enumerate(produkty):
+                wyniki[i], kandydaci[i] = self.preklasyfikator.klasyfikuj(tytul, opis)
+                if wyniki[i] is not None: self.decyzje_lokalne += 1
+        aktywne = {i: self.KORZEN for i in range(len(produkty)) if wyniki[i] is None and self.dzieci(self.KORZEN)}
+
+        with tqdm(total=len(produkty), desc="Kategoryzacja AI", disable=not postep) as pbar:
+            pbar.update(len(produkty) - len(aktywne))
+            while aktywne:
+                # Jedna runda = jeden poziom drzewa; grupujemy unikalne treści według węzła.
+                do_zapytania, biezace = {}, {}
+                for i, wezel in aktywne.items():
+                    if (klucze[i], wezel) in self.decyzje:
+                        self.trafienia_cache += 1
+                        continue
+                    dzieci = self.dozwolone_dzieci(wezel, kandydaci[i])
+                    if len(dzieci) == 1:
+                        biezace[(klucze[i], wezel)] = dzieci[0]
+                        self.decyzje_lokalne += 1
+                    else:
+                        do_zapytania.setdefault(wezel, {}).setdefault(klucze[i], (i, dzieci))
+                self._rozstrzygnij_wezly(do_zapytania, produkty, biezace)
+
+                nastepne = {}
+                for i, wezel in aktywne.items():
+                    klucz = (klucze[i], wezel)
+                    wybor = self.decyzje[klucz] if klucz in self.decyzje else biezace[klucz]
+                    wyniki[i] = wyniki[i] or wybor if wybor == 'BŁĄD_ETAP1' else wybor
+                    if isinstance(wybor, int) and self.dzieci(wybor):
+                        nastepne[i] = wybor; continue
+                    pbar.update(1)
+                aktywne = nastepne
+        return wyniki
+
+    def _rozstrzygnij_wezly(self, do_zapytania, produkty, biezace):
+        """Pyta LLM o wybory we wszystkich węzłach rundy naraz (przez dispatcher).
+
+        Poprawne decyzje trafiają do cache, błędy tylko do `biezace` (bieżąca runda). Paczka dostaje
+        sumę opcji dozwolonych dla jej produktów, żeby zawężanie nie rozbijało paczek na drobne prompty.
+        """
+        paczki, zapytania = [], []
+        for wezel, unikalne in do_zapytania.items():
+            unikalne = list(unikalne.items())
+            for start in range(0, len(unikalne), self.rozmiar_paczki):
+                fragment = unikalne[start:start + self.rozmiar_paczki]
+                paczka = [(klucz, i) for klucz, (i, _) in fragment]
+                dozwolone = set().union(*(dzieci for _, (_, dzieci) in fragment))
+                dzieci = tuple(kat_id for kat_id in self.dzieci(wezel) if kat_id in dozwolone)
+                produkty_str = "".join(
+                    f"---\nProdukt: {nr}\nTytuł: \"{produkty[i][0]}\"\nOpis: \"{produkty[i][1]}\"\n" for nr, (_, i) in enumerate(paczka, 1))
+                sciezka_str = self.sciezka(wezel)
+                user_prompt = f"""Aktualna ścieżka: "{sciezka_str if sciezka_str else 'START'}". Wybierz najlepszą podkategorię z listy dla każdego produktu poniżej.\n--- OPCJE ---\n{self.opcje(dzieci)}\n--- KONIEC ---\n{produkty_str}\nZwróć listę JSON w wymaganym formacie:"""
+                paczki.append((wezel, dzieci, paczka))
+                zapytania.append(dict(model=self.model, response_format={"type": "json_object"}, messages=[{"role": "system", "content": SYSTEM_PROMPT_KATEGORYZACJI}, {"role": "user", "content": user_prompt}], temperature=0.0, timeout=self.timeout))
+
+        self.wywolania_llm += len(zapytania)
+        for (wezel, dzieci, paczka), zapytanie, future in zip(paczki, zapytania, self.dispatcher.map(zapytania)):
+            dozwolone = set(dzieci)
+            try:
+                response = future.result()
+            except Exception as e:
+                print(f" -> BŁĄD API w Etapie 1 dla ID {', '.join(str(produkty[i][2]) for _, i in paczka)}: {e}")
+                for klucz, _ in paczka:
+                    biezace[(klucz, wezel)] = 'BŁĄD_API_1'
+                continue
+            wybory = {}
+            try:
+                for item in json.loads(response.choices[0].message.content.strip()).get('wybory', []):
+                    if isinstance(item, dict) and 'produkt' in item and 'id' in item:
+                        wybory[str(item['produkt'])] = str(item['id']).strip()
+            except Exception as e:
+                # Nieczytelna odpowiedź (ucięty JSON, zły format) - wszystkie produkty paczki dostaną BŁĄD_ETAP1 poniżej.
+                print(f" -> Nieczytelna odpowiedź w Etapie 1 dla ID {', '.join(str(produkty[i][2]) for _, i in paczka)}: {e}")
+                wybory = {}
+            odrzuc = False
+            for nr, (klucz, _) in enumerate(paczka, 1):
+                wybor = wybory.get(str(nr), '')
+                if wybor.isdigit() and int(wybor) in dozwolone:
+                    self.decyzje[(klucz, wezel)] = int(wybor)
+                    if self.checkpoint is not None: self.checkpoint.dopisz(self.NAZWA_CHECKPOINTU, [klucz, wezel, int(wybor)])
+                else:
+                    biezace[(klucz, wezel)] = 'BŁĄD_ETAP1'
+                    odrzuc = True
+            if odrzuc: self.dispatcher.odrzuc(zapytanie)
@@ -0,0 +1,166 @@
+import json
+import os
+import pickle
+from array import array
+
+WERSJA_CACHE = 1
+
+
+class CategoryIndex:
+    """Zwarty, jednorazowo budowany indeks drzewa kategorii OLX.
+
+    Węzły trzymane są w równoległych tablicach (pozycja = numer węzła), dzieci w układzie CSR
+    (`_dzieci_start`/`_dzieci`), a pełne ścieżki, głębokości i listy przodków są liczone raz,
+    w czasie liniowym. Dzięki temu każde zapytanie o ścieżkę to O(1), a cały indeks można
+    zapisać do binarnego cache i wczytać przy starcie bez ponownego parsowania JSON.
+    """
+
+    __slots__ = ('ids', 'nazwy', 'rodzice_surowe', 'rodzice', 'liscie', 'glebokosci', 'sciezki',
+                 '_pozycja', '_dzieci_start', '_dzieci', '_korzenie', '_przodkowie')
+
+    BRAK_RODZICA = -1
+
+    @classmethod
+    def z_listy(cls, kategorie_lista):
+        indeks = cls.__new__(cls)
+        kategorie = [kat for kat in kategorie_lista if 'id' in kat]
+        indeks.ids = array('q', (kat['id'] for kat in kategorie))
+        indeks._pozycja = {kat_id: i for i, kat_id in enumerate(indeks.ids)}
+        indeks.nazwy = [kat.get('name', 'Bez nazwy') for kat in kategorie]
+        indeks.rodzice_surowe = [kat.get('parent_id') for kat in kategorie]
+        indeks.rodzice = array('l', (indeks._pozycja.get(p, cls.BRAK_RODZICA) if p else cls.BRAK_RODZICA for p in indeks.rodzice_surowe))
+        indeks.liscie = bytearray(bool(kat.get('is_leaf', False)) for kat in kategorie)
+        indeks._zbuduj_dzieci()
+        indeks._zbuduj_sciezki()
+        return indeks
+
+    @classmethod
+    def wczytaj(cls, plik_json, plik_cache=None):
+        """Wczytuje indeks z binarnego cache, jeśli jest aktualny względem `plik_json`; w przeciwnym razie buduje go i zapisuje cache."""
+        sygnatura = cls._sygnatura(plik_json)
+        if plik_cache and os.path.exists(plik_cache):
+            try:
+                with open(plik_cache, 'rb') as f:
+                    dane = pickle.load(f)
+                if dane.get('wersja') == WERSJA_CACHE and dane.get('sygnatura') == sygnatura:
+                    return cls._z_cache(dane)
+            except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError):
+                pass  # Uszkodzony lub nieaktualny cache - przebudowujemy
+
+        with open(plik_json, 'r', encoding='utf-8') as f:
+            json_data = json.load(f)
+        kategorie_lista = json_data['data'] if isinstance(json_data, dict) and 'data' in json_data else json_data
+        indeks = cls.z_listy(kategorie_lista)
+        if plik_cache:
+            try: indeks.zapisz_cache(plik_cache, sygnatura)
+            except OSError: pass
+        return indeks
+
+    def zapisz_cache(self, plik_cache, sygnatura=None):
+        dane = {'wersja': WERSJA_CACHE, 'sygnatura': sygnatura,
+                **{pole: getattr(self, pole) for pole in ('ids', 'nazwy', 'rodzice_surowe', 'rodzice', 'liscie', 'glebokosci', 'sciezki', '_dzieci_start', '_dzieci', '_korzenie')}}
+        tymczasowy = plik_cache + ".tmp"
+        with open(tymczasowy, 'wb') as f:
+            pickle.dump(dane, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tymczasowy, plik_cache)
+
+    @staticmethod
+    def _sygnatura(plik_json):
+        stat = os.stat(plik_json)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    @classmethod
+    def _z_cache(cls, dane):
+        indeks = cls.__new__(cls)
+        for pole in ('ids', 'nazwy', 'rodzice_surowe', 'rodzice', 'liscie', 'glebokosci', 'sciezki', '_dzieci_start', '_dzieci', '_korzenie'):
+            setattr(indeks, pole, dane[pole])
+        indeks._pozycja = {kat_id: i for i, kat_id in enumerate(indeks.ids)}
+        indeks._przodkowie = {}
+        return indeks
+
+    def _zbuduj_dzieci(self):
+        n = len(self.ids)
+        liczby = [0] * (n + 1)
+        for rodzic in self.rodzice:
+            if rodzic != self.BRAK_RODZICA: liczby[rodzic + 1] += 1
+        for i in range(n): liczby[i + 1] += liczby[i]
+        self._dzieci_start = array('l', liczby)
+        dzieci, wolne = array('l', [0]) * liczby[n], liczby[:n]
+        # Kolejność dzieci jak w pliku kategorii (tak samo jak dawne `children_ids`).
+        for i, rodzic in enumerate(self.rodzice):
+            if rodzic != self.BRAK_RODZICA:
+                dzieci[wolne[rodzic]] = i
+                wolne[rodzic] += 1
+        self._dzieci = dzieci
+        self._korzenie = array('l', (i for i, p in enumerate(self.rodzice_surowe) if p == 0))
+
+    def _zbuduj_sciezki(self):
+        """Ścieżki i głębokości w czasie liniowym - każdy węzeł liczony raz, na podstawie już policzonego rodzica."""
+        n = len(self.ids)
+        sciezki, glebokosci = [None] * n, array('l', [0]) * n
+        for start in range(n):
+            stos, i = [], start
+            while i != self.BRAK_RODZICA and sciezki[i] is None and i not in stos:
+                stos.append(i)
+                i = self.rodzice[i]
+            if i != self.BRAK_RODZICA and sciezki[i] is None: i = self.BRAK_RODZICA  # Cykl w danych - przerywamy
+            for j in reversed(stos):
+                if i == self.BRAK_RODZICA:
+                    # Rodzic spoza pliku kategorii oznaczany jest jako '???' (jak w dawnej mapie ścieżek).
+                    sciezki[j] = f"??? > {self.nazwy[j]}" if self.rodzice_surowe[j] else self.nazwy[j]
+                    glebokosci[j] = 0
+                else:
+                    sciezki[j] = f"{sciezki[i]} > {self.nazwy[j]}"
+                    glebokosci[j] = glebokosci[i] + 1
+                i = j
+        self.sciezki, self.glebokosci = sciezki, glebokosci
+        self._przodkowie = {}
+
+    # --- Zapytania ---
+
+    def __contains__(self, kat_id):
+        return kat_id in self._pozycja
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def korzenie(self):
+        return [self.ids[i] for i in self._korzenie]
+
+    def dzieci(self, kat_id):
+        i = self._pozycja[kat_id]
+        return [self.ids[j] for j in self._dzieci[self._dzieci_start[i]:self._dzieci_start[i + 1]]]
+
+    def nazwa(self, kat_id):
+        return self.nazwy[self._pozycja[kat_id]]
+
+    def czy_lisc(self, kat_id):
+        """Liść w sensie nawigacji: oznaczony jako liść albo bez dzieci."""
+        i = self._pozycja[kat_id]
+        return bool(self.liscie[i]) or self._dzieci_start[i] == self._dzieci_start[i + 1]
+
+    def sciezka(self, kat_id, domyslna=None):
+        i = self._pozycja.get(kat_id)
+        return self.sciezki[i] if i is not None else domyslna
+
+    def glebokosc(self, kat_id):
+        return self.glebokosci[self._pozycja[kat_id]]
+
+    def przodkowie(self, kat_id):
+        """ID przodków od korzenia do rodzica (memoizowane)."""
+        i = self._pozycja[kat_id]
+        stos = []
+        while i not in self._przodkowie:
+            stos.append(i)
+            if self.glebokosci[i] == 0:
+                self._przodkowie[i] = ()
+                stos.pop()
+                break
+            i = self.rodzice[i]
+        for j in reversed(stos):
+            self._przodkowie[j] = self._przodkowie[i] + (self.ids[i],)
+            i = j
+        return self._przodkowie[i]
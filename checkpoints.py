@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+
+def _do_json(obj):
+    # Typy NumPy/pandas (np.int64, np.float64, NaN) z wierszy DataFrame'u.
+    if hasattr(obj, 'item'): return obj.item()
+    return str(obj)
+
+
+class CheckpointStore:
+    """Trwałe punkty kontrolne etapów w katalogu z plikami JSONL.
+
+    Każda zakończona jednostka pracy (strona skanu, decyzja kategoryzacji, paczka audytu,
+    korekta) jest dopisywana jako jedna linia `<nazwa>.jsonl`, więc po awarii ponowne
+    uruchomienie wczytuje gotowe jednostki i liczy tylko resztę. Wynik całego etapu
+    zapisywany jest atomowo jako `etapN.jsonl` - jego istnienie oznacza, że etap jest zakończony.
+    """
+
+    def __init__(self, katalog):
+        self.katalog = katalog
+        self._lock = threading.Lock()
+        os.makedirs(katalog, exist_ok=True)
+
+    def plik(self, nazwa):
+        return os.path.join(self.katalog, f"{nazwa}.jsonl")
+
+    def wczytaj(self, nazwa):
+        """Zwraca zapisane rekordy; urwana ostatnia linia (przerwany zapis) jest pomijana."""
+        rekordy = []
+        if not os.path.exists(self.plik(nazwa)):
+            return rekordy
+        with open(self.plik(nazwa), 'r', encoding='utf-8') as f:
+            for linia in f:
+                try: rekordy.append(json.loads(linia))
+                except json.JSONDecodeError: break
+        return rekordy
+
+    def dopisz(self, nazwa, rekord):
+        linia = json.dumps(rekord, ensure_ascii=False, default=_do_json) + "\n"
+        with self._lock, open(self.plik(nazwa), 'a', encoding='utf-8') as f:
+            f.write(linia)
+
+    def czy_pusty(self):
+        return not any(nazwa.endswith('.jsonl') for nazwa in os.listdir(self.katalog))
+
+    def czy_zakonczony(self, etap):
+        return os.path.exists(self.plik(etap))
+
+    def zapisz_etap(self, etap, df):
+        """Atomowo zapisuje wynik etapu (zapis do pliku tymczasowego i zamiana)."""
+        self.rozpocznij_etap(etap)
+        self.dopisz_do_etapu(etap, df)
+        self.zamknij_etap(etap)
+
+    def rozpocznij_etap(self, etap):
+        """Zaczyna przyrostowy zapis wyniku etapu (tryb strumieniowy); etap nie jest jeszcze zakończony."""
+        open(self.plik(etap) + ".tmp", 'w', encoding='utf-8').close()
+
+    def dopisz_do_etapu(self, etap, df):
+        with self._lock, open(self.plik(etap) + ".tmp", 'a', encoding='utf-8') as f:
+            for rekord in df.to_dict('records'):
+                f.write(json.dumps(rekord, ensure_ascii=False, default=_do_json) + "\n")
+
+    def zamknij_etap(self, etap):
+        tymczasowy = self.plik(etap) + ".tmp"
+        with open(tymczasowy, 'a', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tymczasowy, self.plik(etap))
+
+    def wczytaj_etap(self, etap):
+        return pd.DataFrame(self.wczytaj(etap))
+
+    def wyczysc(self, etapy=None):
+        """Usuwa punkty kontrolne wskazanych etapów (np. [2, 3]); bez argumentu - wszystkie."""
+        for nazwa in os.listdir(self.katalog):
+            if not nazwa.endswith('.jsonl') and not nazwa.endswith('.jsonl.tmp'):
+                continue
+            if etapy is None or any(nazwa.startswith(f"etap{n}") for n in etapy):
+                os.remove(os.path.join(self.katalog, nazwa))
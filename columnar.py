@@ -0,0 +1,62 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+ZNACZNIKI_KONCA_OPISU = ["W razie pytań lub wątpliwości", "Specyfikacja:"]  # Wszystko od znacznika to stopka sprzedawcy
+FRAZY_DO_USUNIECIA = [re.compile(wzorzec, re.IGNORECASE) for wzorzec in
+                      ["Towar powystawowy, outletowy, stoki magazynowe.", "Produkt fabrycznie nowy, nieużywany w oryginalnym opakowaniu."]]
+
+KOLUMNY_STATYSTYK = {'advert_views': 'views_per_day', 'phone_views': 'phone_views_per_day',
+                     'users_observing': 'observers_per_day', 'liczba_wiadomosci': 'total_messages_per_day'}
+
+
+def wiek_w_dniach(created_at, teraz=None):
+    """Pełne dni od `created_at` (tekst 'RRRR-MM-DD GG:MM:SS', czas UTC) do `teraz`; brak daty daje 0."""
+    teraz = pd.Timestamp.now(tz='UTC').tz_localize(None) if teraz is None else teraz
+    daty = pd.to_datetime(pd.Series(created_at, dtype=object).str.slice(0, 19).str.replace(' ', 'T', regex=False),
+                          format='%Y-%m-%dT%H:%M:%S', errors='coerce')
+    return (teraz - daty).dt.days.fillna(0).to_numpy(dtype=np.int64)
+
+
+def oblicz_nagrode(stats, liczba_wiadomosci, wiek_dni, wagi, min_wiek_dni=0):
+    """Nagroda jednego ogłoszenia: ważona suma statystyk (KOLUMNY_STATYSTYK) na dzień życia."""
+    if wiek_dni < min_wiek_dni: return 0
+    wartosci = dict(stats, liczba_wiadomosci=liczba_wiadomosci)
+    return sum((wartosci.get(kolumna) or 0) * wagi[waga] for kolumna, waga in KOLUMNY_STATYSTYK.items()) / max(1, wiek_dni)
+
+
+def oblicz_nagrody(df, wagi, min_wiek_dni=0, teraz=None):
+    """Kolumnowy odpowiednik `oblicz_nagrode` dla całego DataFrame'u naraz.
+
+    `df` ma kolumny 'advert_views', 'phone_views', 'users_observing', 'liczba_wiadomosci'
+    i 'created_at' (albo gotową kolumnę 'wiek_dni'); zwraca tablicę nagród w kolejności wierszy.
+    """
+    wiek = df['wiek_dni'].to_numpy(dtype=np.int64) if 'wiek_dni' in df else wiek_w_dniach(df['created_at'], teraz)
+    dni = np.maximum(wiek, 1).astype(np.float64)
+    suma = np.zeros(len(df))
+    for kolumna, waga in KOLUMNY_STATYSTYK.items():
+        suma += df[kolumna].fillna(0).to_numpy(dtype=np.float64) * wagi[waga]
+    return np.where(wiek < min_wiek_dni, 0.0, suma / dni)
+
+
+def przeszukaj_wagi(df, warianty_wag, min_nagroda, min_wiek_dni=0, teraz=None):
+    """Dla każdego wariantu wag zwraca liczbę ogłoszeń powyżej `min_nagroda`; wiek liczony jest raz dla wszystkich wariantów."""
+    df = df.assign(wiek_dni=wiek_w_dniach(df['created_at'], teraz)) if 'wiek_dni' not in df else df
+    return [int((oblicz_nagrody(df, wagi, min_wiek_dni) > min_nagroda).sum()) for wagi in warianty_wag]
+
+
+def czysc_opis(opis, tytul):
+    if not isinstance(opis, str): return ""
+    for wzorzec in ZNACZNIKI_KONCA_OPISU:
+        if wzorzec in opis: opis = opis.split(wzorzec, 1)[0].strip()
+    if isinstance(tytul, str) and opis.startswith(tytul): opis = opis[len(tytul):].strip()
+    for fraza in FRAZY_DO_USUNIECIA:
+        opis = fraza.sub('', opis).strip()
+    return opis
+
+
+def czysc_opisy(opisy, tytuly):
+    """`czysc_opis` dla całej kolumny naraz (wzorce są skompilowane raz; bez narzutu `DataFrame.apply(axis=1)`)."""
+    opisy = pd.Series(opisy, dtype=object)
+    return pd.Series([czysc_opis(opis, tytul) for opis, tytul in zip(opisy, tytuly)], index=opisy.index, dtype=object)
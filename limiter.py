@@ -0,0 +1,54 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Współdzielony między wątkami limiter typu token bucket.
+
+    Zastępuje stałe `time.sleep` przed każdym zapytaniem: wątki pobierają żetony
+    z jednego wiadra uzupełnianego w tempie `rate` na sekundę, więc globalny
+    budżet zapytań jest zachowany niezależnie od liczby wątków.
+    """
+
+    def __init__(self, rate, capacity=1.0):
+        if rate <= 0:
+            raise ValueError("Tempo limitera musi być dodatnie.")
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self.total_wait = 0.0
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._wstrzymane_do = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        """Blokuje, dopóki nie będzie dostępnych `tokens` żetonów. Zwraca czas oczekiwania w sekundach."""
+        tokens = min(float(tokens), self.capacity)
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._wstrzymane_do:
+                    brakujacy_czas = self._wstrzymane_do - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                    self._last = now
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        waited = now - start
+                        self.total_wait += waited
+                        return waited
+                    brakujacy_czas = (tokens - self._tokens) / self.rate
+            time.sleep(brakujacy_czas)
+
+    def wstrzymaj(self, sekundy):
+        """Wstrzymuje wydawanie żetonów wszystkim wątkom na `sekundy` (np. po 429 z Retry-After).
+
+        Żetony zebrane wcześniej przepadają, a wiadro zaczyna się uzupełniać dopiero po przerwie;
+        kolejne wywołania mogą przerwę tylko wydłużyć.
+        """
+        with self._lock:
+            koniec = time.monotonic() + sekundy
+            if koniec > self._wstrzymane_do:
+                self._wstrzymane_do = self._last = koniec
+                self._tokens = 0.0
@@ -0,0 +1,179 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import openai
+
+from limiter import TokenBucket
+from response_cache import klucz_zapytania
+
+BLEDY_DO_PONOWIENIA = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def szacuj_tokeny_tekstu(tekst):
+    """Zgrubny szacunek tokenów tekstu (~4 znaki na token)."""
+    return len(tekst) // 4 + 1
+
+
+def szacuj_tokeny(zapytanie):
+    """Szacunek tokenów zapytania (suma wiadomości) plus zapas na odpowiedź."""
+    return sum(szacuj_tokeny_tekstu(m.get('content') or '') for m in zapytanie.get('messages', [])) + zapytanie.get('max_tokens', 256)
+
+
+class LlmDispatcher:
+    """Współbieżny dyspozytor wywołań `chat.completions.create`.
+
+    Zapytania wykonywane są w puli wątków w ramach budżetów zapytań (RPM) i tokenów (TPM)
+    na minutę, z ponawianiem błędów przejściowych i wykładniczym backoffem. `map` zwraca
+    futures w kolejności zapytań, więc wyniki obsługuje się tak jak przy wywołaniach po kolei.
+
+    Z `cache` (ResponseCache) deterministyczne zapytania (temperature=0) są obsługiwane z cache
+    odpowiedzi, a identyczne zapytania trwające jednocześnie współdzielą jedno wywołanie.
+    """
+
+    def __init__(self, client, max_workers=8, rpm=500, tpm=200000, max_retries=3, backoff=2.0, max_backoff=60.0, cache=None, telemetria=None):
+        # Ponowienia obsługujemy sami, żeby każda próba przechodziła przez limitery.
+        self.client = client.with_options(max_retries=0) if hasattr(client, 'with_options') else client
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limiter_zapytan = TokenBucket(rpm / 60, capacity=max(1, rpm / 60))
+        self.limiter_tokenow = TokenBucket(tpm / 60, capacity=tpm / 6)
+        self.wywolania = 0
+        self.ponowienia = 0
+        self.bledy = 0
+        self.tokeny = 0
+        self.czas_wywolan = 0.0
+        self.cache = cache
+        self.telemetria = telemetria
+        self.z_cache = 0
+        self.chybienia_cache = 0
+        self.zdeduplikowane = 0
+        self.tokeny_z_cache = 0
+        self._w_locie = {}  # klucz zapytania -> Future trwającego wywołania
+        self._zlecone = set()  # Futures z puli, które jeszcze się nie zakończyły
+        self._lock = threading.RLock()  # _zlec bywa wywoływane z submit pod tą samą blokadą
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._start = time.perf_counter()
+
+    def submit(self, **zapytanie):
+        cache = self.cache
+        if cache is None or zapytanie.get('temperature') != 0:
+            return self._zlec(zapytanie)
+        klucz = klucz_zapytania(zapytanie)
+        response = cache.pobierz(klucz)
+        if response is not None:
+            usage = getattr(response, 'usage', None)
+            with self._lock:
+                self.z_cache += 1
+                self.tokeny_z_cache += getattr(usage, 'total_tokens', None) or 0
+            self._telemetria('llm_z_cache', 1, zapytanie)
+            future = Future()
+            future.set_result(response)
+            return future
+        with self._lock:
+            self.chybienia_cache += 1
+            if klucz in self._w_locie:
+                self.zdeduplikowane += 1
+                self._telemetria('llm_zdeduplikowane', 1, zapytanie)
+                return self._w_locie[klucz]
+            future = self._w_locie[klucz] = self._zlec(zapytanie, klucz, cache)
+        return future
+
+    def _zlec(self, zapytanie, klucz=None, cache=None):
+        future = self._pool.submit(self._wykonaj, zapytanie, klucz, cache)
+        with self._lock: self._zlecone.add(future)
+        future.add_done_callback(self._zakonczone)
+        return future
+
+    def _zakonczone(self, future):
+        with self._lock: self._zlecone.discard(future)
+
+    def anuluj_oczekujace(self):
+        """Anuluje zapytania czekające w kolejce i czeka na te, które już trwają.
+
+        Wywoływane przed zamknięciem cache po błędzie etapu - porzucone zapytania nie zużywają
+        tokenów, a żaden wątek nie zapisuje już do zamkniętego cache.
+        """
+        with self._lock: zlecone = list(self._zlecone)
+        for future in zlecone: future.cancel()
+        wait(zlecone)
+        with self._lock: self._w_locie.clear()
+
+    def odrzuc(self, zapytanie):
+        """Usuwa z cache odpowiedź, której nie dało się użyć (np. niepełny JSON) - ponowienie zapyta API od nowa."""
+        if self.cache is not None: self.cache.usun(klucz_zapytania(zapytanie))
+
+    def map(self, zapytania):
+        """Zleca wszystkie zapytania naraz; zwraca listę futures w tej samej kolejności."""
+        return [self.submit(**zapytanie) for zapytanie in zapytania]
+
+    def _wykonaj(self, zapytanie, klucz=None, cache=None):
+        try:
+            response = self._wywolaj(zapytanie)
+            if cache is not None: cache.zapisz(klucz, zapytanie.get('model'), response)
+            return response
+        finally:
+            if klucz is not None:
+                with self._lock: self._w_locie.pop(klucz, None)
+
+    def _wywolaj(self, zapytanie):
+        szacunek = szacuj_tokeny(zapytanie)
+        proba = 0
+        while True:
+            oczekiwanie = self.limiter_zapytan.acquire() + self.limiter_tokenow.acquire(szacunek)
+            self._telemetria('llm_oczekiwanie_s', oczekiwanie, zapytanie)
+            start = time.perf_counter()
+            try:
+                response = self.client.chat.completions.create(**zapytanie)
+            except BLEDY_DO_PONOWIENIA:
+                self._zapisz(zapytanie, time.perf_counter() - start)
+                if proba >= self.max_retries:
+                    with self._lock: self.bledy += 1
+                    self._telemetria('llm_bledy', 1, zapytanie)
+                    raise
+                proba += 1
+                with self._lock: self.ponowienia += 1
+                self._telemetria('llm_ponowienia', 1, zapytanie)
+                time.sleep(min(self.max_backoff, self.backoff * 2 ** (proba - 1)))
+                continue
+            except Exception:
+                self._zapisz(zapytanie, time.perf_counter() - start)
+                with self._lock: self.bledy += 1
+                self._telemetria('llm_bledy', 1, zapytanie)
+                raise
+            self._zapisz(zapytanie, time.perf_counter() - start, getattr(response, 'usage', None))
+            return response
+
+    def _zapisz(self, zapytanie, czas, usage=None):
+        with self._lock:
+            self.wywolania += 1
+            self.czas_wywolan += czas
+            self.tokeny += getattr(usage, 'total_tokens', None) or 0
+        if self.telemetria is not None:
+            self.telemetria.zapisz_czas('llm', czas, zapytanie.get('model', ''))
+            self._telemetria('llm_tokeny_wejscie', getattr(usage, 'prompt_tokens', None) or 0, zapytanie)
+            self._telemetria('llm_tokeny_wyjscie', getattr(usage, 'completion_tokens', None) or 0, zapytanie)
+
+    def _telemetria(self, licznik, wartosc, zapytanie):
+        if self.telemetria is not None: self.telemetria.dodaj(licznik, wartosc, zapytanie.get('model', ''))
+
+    def raport(self):
+        czas = time.perf_counter() - self._start
+        with self._lock:
+            return {'wywolania': self.wywolania, 'ponowienia': self.ponowienia, 'bledy': self.bledy, 'tokeny': self.tokeny,
+                    'srednia_latencja_s': self.czas_wywolan / self.wywolania if self.wywolania else 0.0,
+                    'wywolania_na_minute': 60 * self.wywolania / czas if czas else 0.0,
+                    'tokeny_na_minute': 60 * self.tokeny / czas if czas else 0.0,
+                    'z_cache': self.z_cache, 'chybienia_cache': self.chybienia_cache, 'zdeduplikowane': self.zdeduplikowane, 'tokeny_z_cache': self.tokeny_z_cache}
+
+    def wypisz_raport(self):
+        r = self.raport()
+        print(f"Statystyki LLM: {r['wywolania']} wywołań ({r['ponowienia']} ponowień, {r['bledy']} błędów), {r['tokeny']} tokenów, "
+              f"śr. latencja {r['srednia_latencja_s']:.1f} s, {r['wywolania_na_minute']:.0f} wywołań/min, {r['tokeny_na_minute']:.0f} tokenów/min")
+        if self.cache is not None:
+            print(f"Cache odpowiedzi LLM: {r['z_cache']} trafień ({r['tokeny_z_cache']} tokenów zaoszczędzonych), {r['chybienia_cache']} chybień, {r['zdeduplikowane']} zapytań zdeduplikowanych, {len(self.cache)} wpisów.")
+
+    def zamknij(self):
+        self._pool.shutdown(wait=True)
@@ -1,35 +1,80 @@
 import pandas as pd
 import openai
 import json
-import time
 import requests
 import csv
 from datetime import datetime, timezone
 from tqdm import tqdm
-import re
-
-# Importowanie konfiguracji z osobnego pliku
-import config
+import argparse
+import os
+import queue
+import threading
+import time
+import types
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from advert_cache import AdvertCache
+from audit_batcher import AuditBatcher
+from categorizer import HierarchicalCategorizer
+from category_index import CategoryIndex
+from checkpoints import CheckpointStore
+from columnar import czysc_opis, czysc_opisy, oblicz_nagrode, oblicz_nagrody, przeszukaj_wagi
+from limiter import TokenBucket
+from llm_dispatcher import LlmDispatcher
+from olx_client import OlxClient
+from preclassifier import CategoryPreclassifier
+from response_cache import ResponseCache
+from telemetry import Telemetry, profiluj
+
+# Importowanie konfiguracji z osobnego pliku; bez config.py klucze są brane ze zmiennych środowiskowych
+try:
+    import config
+except ImportError:
+    config = types.SimpleNamespace(OPENAI_API_KEY=os.environ.get('OPENAI_API_KEY'), OLX_ACCESS_TOKEN=os.environ.get('OLX_ACCESS_TOKEN'))
 
 # ==============================================================================
 # ===================   ZUNIFIKOWANA KONFIGURACJA   ====================
 # ==============================================================================
 
-# --- Klucze API i Konfiguracja są teraz w pliku config.py ---
+# --- Klucze API i Konfiguracja są teraz w pliku config.py (albo w zmiennych OPENAI_API_KEY i OLX_ACCESS_TOKEN) ---
 
 # --- Konfiguracja Etapu 1: Skanowanie i Filtracja ---
 MIN_REWARD_SCORE = 0.5
 MAX_ADS_TO_PROCESS = 500  # Ustaw 0, aby przetworzyć WSZYSTKIE ogłoszenia
 REQUESTS_PER_SECOND = 10
+OLX_MAX_RETRIES = 4  # Ponowienia na 429/5xx i błędach połączenia (z wykładniczym backoffem)
+MAX_CONCURRENT_REQUESTS = 16  # Liczba wątków skanera; globalne tempo i tak ogranicza REQUESTS_PER_SECOND
+PAGES_PREFETCH = 4  # Ile stron /adverts pobierać z wyprzedzeniem
+STATUSY_ZAKONCZONE = ['removed_by_user', 'outdated']  # Tylko te ogłoszenia są oceniane; ich statystyki już się nie zmieniają
 
 # --- Konfiguracja Etapu 2 i 3: Analiza AI ---
 MODEL_KATEGORYZACJI = "gpt-4o-mini"
 MODEL_EKSPERTA_AUDYTORA = "gpt-4o"
-ROZMIAR_PACZKI_DO_ANALIZY_AI = 25
+ROZMIAR_PACZKI_DO_ANALIZY_AI = 50  # Górny limit ogłoszeń w paczce audytu; faktyczny rozmiar wyznacza budżet tokenów
+LIMIT_TOKENOW_PACZKI_AUDYTU = 12000  # Szacowane tokeny promptu i odpowiedzi na jedną paczkę audytu
+ROZMIAR_PACZKI_KATEGORYZACJI = 20  # Ile ogłoszeń z tego samego węzła drzewa trafia do jednego promptu
+LLM_MAX_ROWNOLEGLYCH = 8  # Ile wywołań OpenAI może trwać jednocześnie
+LLM_LIMIT_ZAPYTAN_NA_MINUTE = 500
+LLM_LIMIT_TOKENOW_NA_MINUTE = 200000
+LLM_CACHE_MAX_WPISOW = 100000  # Cache odpowiedzi OpenAI (zapytania z temperature=0); najdawniej używane wpisy są usuwane
+LLM_CACHE_MAX_WIEK_DNI = 30
+UZYJ_PREKLASYFIKATORA = True  # Lokalny klasyfikator TF-IDF przed Etapem 2.1 (mniej i krótsze prompty)
+PREKLASYFIKATOR_TOP_K = 8  # Ilu najlepszych liści (z przodkami) zostawić w opcjach dla LLM; 0 = bez zawężania
+PREKLASYFIKATOR_PROG_PEWNOSCI = 0.6  # Od tej oceny liść wybierany jest bez LLM; None = zawsze pytaj LLM
+
+# --- Konfiguracja trybu strumieniowego (--strumieniowo) ---
+ROZMIAR_KOLEJKI_STRUMIENIA = 200  # Maks. liczba ogłoszeń czekających między etapami (backpressure)
+CZAS_ZBIERANIA_PARTII_S = 5.0  # Ile najwyżej czekać na dopełnienie partii, zanim zostanie wysłana niepełna
 
 # --- Nazwy Plików ---
 PLIK_KATEGORII = 'kategorie.json'
+PLIK_INDEKSU_KATEGORII = 'kategorie.idx'  # Binarny cache indeksu kategorii; przebudowywany po zmianie PLIK_KATEGORII
 PLIK_WYNIKOWY = 'ostateczna_weryfikacja.csv'
+PLIK_CACHE_OGLOSZEN = 'cache_ogloszen.sqlite'
+PLIK_CACHE_ODPOWIEDZI_LLM = 'cache_odpowiedzi_llm.sqlite'
+KATALOG_CHECKPOINTOW = 'checkpointy'
+PLIK_TELEMETRII = 'telemetria.json'  # Raport czasów (p50/p95) i liczników zapytań z ostatniego przebiegu
 
 # --- Parametry Oceny Ogłoszeń ("Nagrody") w Etapie 1 ---
 WEIGHTS = {
@@ -41,321 +86,637 @@ WEIGHTS = {
 MIN_AD_AGE_DAYS = 0
 
 # --- Ustawienia Techniczne ---
-BASE_OLX_API_URL = "https://www.olx.pl/api/partner"
-DELAY_BETWEEN_REQUESTS = 1 / REQUESTS_PER_SECOND
+BASE_OLX_API_URL = os.environ.get('OLX_API_URL', "https://www.olx.pl/api/partner")  # Adres OpenAI można podmienić zmienną OPENAI_BASE_URL
+OLX_PAGE_LIMIT = 50
+OLX_LIMITER = TokenBucket(REQUESTS_PER_SECOND)
+TELEMETRIA = Telemetry()
 OLX_HEADERS = {'Authorization': f'Bearer {config.OLX_ACCESS_TOKEN}', 'Version': '2.0'}
+OLX_CLIENT = OlxClient(BASE_OLX_API_URL, OLX_HEADERS, limiter=OLX_LIMITER, pool_size=MAX_CONCURRENT_REQUESTS, max_retries=OLX_MAX_RETRIES, telemetria=TELEMETRIA)
 OPENAI_CLIENT = openai.OpenAI(api_key=config.OPENAI_API_KEY) if config.OPENAI_API_KEY else None
+LLM_DISPATCHER = LlmDispatcher(OPENAI_CLIENT, max_workers=LLM_MAX_ROWNOLEGLYCH, rpm=LLM_LIMIT_ZAPYTAN_NA_MINUTE, tpm=LLM_LIMIT_TOKENOW_NA_MINUTE, telemetria=TELEMETRIA) if OPENAI_CLIENT else None
 
 # ==============================================================================
 # =======================   FUNKCJE POMOCNICZE   =======================
 # ==============================================================================
 
 def wczytaj_kategorie_i_zbuduj_mapy():
-    """Wczytuje kategorie i buduje dwie mapy: pełnych ścieżek i zaawansowaną strukturę drzewa."""
+    """Wczytuje kategorie jako `CategoryIndex` (pełne ścieżki i struktura drzewa), korzystając z binarnego cache indeksu."""
     try:
-        with open(PLIK_KATEGORII, 'r', encoding='utf-8') as f:
-            json_data = json.load(f)
-            kategorie_lista = json_data['data'] if isinstance(json_data, dict) and 'data' in json_data else json_data
-
-        id_do_nazwy = {kat['id']: kat['name'] for kat in kategorie_lista}
-        id_do_rodzica = {kat['id']: kat.get('parent_id') for kat in kategorie_lista if kat.get('parent_id')}
-        mapa_sciezek = {}
-        for cat_id in id_do_nazwy:
-            sciezka, aktualny_id = [id_do_nazwy[cat_id]], cat_id
-            while aktualny_id in id_do_rodzica:
-                id_rodzica = id_do_rodzica[aktualny_id]
-                sciezka.insert(0, id_do_nazwy.get(id_rodzica, '???'))
-                aktualny_id = id_rodzica
-            mapa_sciezek[cat_id] = " > ".join(sciezka)
-
-        mapa_zaawansowana = {}
-        for kat in kategorie_lista:
-            if 'id' in kat:
-                mapa_zaawansowana[kat['id']] = {'name': kat.get('name', 'Bez nazwy'), 'parent_id': kat.get('parent_id'), 'is_leaf': kat.get('is_leaf', False), 'children_ids': []}
-        for kat_id, kat_data in mapa_zaawansowana.items():
-            parent_id = kat_data.get('parent_id')
-            if parent_id and parent_id in mapa_zaawansowana:
-                mapa_zaawansowana[parent_id]['children_ids'].append(kat_id)
-
-        return mapa_sciezek, mapa_zaawansowana
+        return CategoryIndex.wczytaj(PLIK_KATEGORII, PLIK_INDEKSU_KATEGORII)
     except FileNotFoundError:
         print(f"BŁĄD: Nie znaleziono pliku '{PLIK_KATEGORII}'. Upewnij się, że znajduje się on w tym samym folderze.")
-        return None, None
+        return None
 
-def get_total_message_count(ad_id):
+@TELEMETRIA.mierzony('liczba_wiadomosci')
+def pobierz_liczbe_wiadomosci(ad_id):
+    """Zwraca (liczba_wiadomosci, kompletna) - przy błędzie API suma jest częściowa i nie nadaje się do cache."""
     total_messages, offset = 0, 0
     while True:
         try:
-            time.sleep(DELAY_BETWEEN_REQUESTS)
-            response = requests.get(f"{BASE_OLX_API_URL}/threads?advert_id={ad_id}&offset={offset}&limit=50", headers=OLX_HEADERS)
-            response.raise_for_status()
-            threads_data = response.json().get('data', [])
+            threads_data = OLX_CLIENT.get('threads', '/threads', {'advert_id': ad_id, 'offset': offset, 'limit': OLX_PAGE_LIMIT}).get('data', [])
             if not threads_data: break
             for thread in threads_data: total_messages += thread.get('total_count', 0)
-            if len(threads_data) < 50: break
+            if len(threads_data) < OLX_PAGE_LIMIT: break
             offset += len(threads_data)
-        except requests.exceptions.RequestException: break
-    return total_messages
+        except requests.exceptions.RequestException: return total_messages, False
+    return total_messages, True
 
 def calculate_reward(stats, total_messages_count, total_age_days):
-    if total_age_days < MIN_AD_AGE_DAYS: return 0
-    total_age_days = max(1, total_age_days)
-    reward = ((stats.get('advert_views', 0) / total_age_days) * WEIGHTS['views_per_day'] +
-              (stats.get('phone_views', 0) / total_age_days) * WEIGHTS['phone_views_per_day'] +
-              (stats.get('users_observing', 0) / total_age_days) * WEIGHTS['observers_per_day'] +
-              (total_messages_count / total_age_days) * WEIGHTS['total_messages_per_day'])
-    return reward
-
-def czysc_opis(opis, tytul):
-    if not isinstance(opis, str): return ""
-    for wzorzec in ["W razie pytań lub wątpliwości", "Specyfikacja:"]:
-        if wzorzec in opis: opis = opis.split(wzorzec)[0].strip()
-    if opis.startswith(tytul): opis = opis[len(tytul):].strip()
-    for wzorzec in ["Towar powystawowy, outletowy, stoki magazynowe.", "Produkt fabrycznie nowy, nieużywany w oryginalnym opakowaniu."]:
-        opis = re.sub(wzorzec, '', opis, flags=re.IGNORECASE).strip()
-    return opis
-
-def get_sciezke_kategorii(kat_id, mapa_zaawansowana):
+    return oblicz_nagrode(stats, total_messages_count, total_age_days, WEIGHTS, MIN_AD_AGE_DAYS)
+
+def get_sciezke_kategorii(kat_id, indeks_kategorii):
     try: kat_id = int(kat_id)
     except (ValueError, TypeError): return str(kat_id)
-    if kat_id not in mapa_zaawansowana: return f"Nieznane ID: {kat_id}"
-    sciezka, aktualny_id = [], kat_id
-    while aktualny_id is not None and aktualny_id != 0:
-        if aktualny_id in mapa_zaawansowana:
-            sciezka.append(mapa_zaawansowana[aktualny_id]['name'])
-            aktualny_id = mapa_zaawansowana[aktualny_id].get('parent_id')
-        else: break
-    return " > ".join(reversed(sciezka))
+    return indeks_kategorii.sciezka(kat_id, f"Nieznane ID: {kat_id}")
 
-# ==============================================================================
-# =========================   GŁÓWNE ETAPY PROCESU   =========================
-# ==============================================================================
+def pobierz_strone_ogloszen(offset):
+    return OLX_CLIENT.get('adverts', '/adverts', {'offset': offset, 'limit': OLX_PAGE_LIMIT}).get('data', [])
 
-def etap1_skanuj_i_filtruj(mapa_sciezek):
-    print("\n" + "="*80)
-    print("--- ETAP 1: Skanowanie i Filtracja Ogłoszeń na OLX ---")
-    print("="*80)
+def iteruj_strony_ogloszen(pool, max_ogloszen=0, start_offset=0, stan=None):
+    """Zwraca pary (offset, strona) z /adverts w kolejności, pobierając PAGES_PREFETCH stron z wyprzedzeniem.
 
-    high_performing_ads = []
-    offset, processed_ads_count, limit_reached = 0, 0, False
-    progress_bar_total = MAX_ADS_TO_PROCESS if MAX_ADS_TO_PROCESS > 0 else None
-    
-    statusy_zakonczone = ['removed_by_user', 'outdated']
-    print(f"INFO: Skrypt będzie analizował tylko ogłoszenia o statusach: {', '.join(statusy_zakonczone)}")
+    Błąd API kończy iterację i ustawia `stan['blad']`, żeby wywołujący wiedział, że skan jest niepełny.
+    """
+    oczekujace = deque()  # pary (offset, future)
+    nastepny_offset = start_offset
+    try:
+        while True:
+            while len(oczekujace) < PAGES_PREFETCH and not (max_ogloszen > 0 and nastepny_offset >= max_ogloszen):
+                oczekujace.append((nastepny_offset, pool.submit(pobierz_strone_ogloszen, nastepny_offset)))
+                nastepny_offset += OLX_PAGE_LIMIT
+            if not oczekujace: return
 
-    with tqdm(total=progress_bar_total, desc="Skanowanie ogłoszeń", unit=" ogł.") as pbar:
-        while not limit_reached:
-            time.sleep(DELAY_BETWEEN_REQUESTS)
+            offset, future = oczekujace.popleft()
             try:
-                response = requests.get(f"{BASE_OLX_API_URL}/adverts?offset={offset}&limit=50", headers=OLX_HEADERS)
-                response.raise_for_status()
-                page_of_ads = response.json().get('data', [])
+                page_of_ads = future.result()
             except requests.exceptions.RequestException as e:
-                print(f"\nBłąd API podczas pobierania strony: {e}. Zakończono skanowanie."); break
-
-            if not page_of_ads: break
-
+                print(f"\nBłąd API podczas pobierania strony: {e}. Zakończono skanowanie.")
+                if stan is not None: stan['blad'] = True
+                return
+            if not page_of_ads: return
+            yield offset, page_of_ads
+
+            # Niepełna strona w środku listy przesuwa offsety - odrzucamy strony pobrane na zapas.
+            if len(page_of_ads) != OLX_PAGE_LIMIT:
+                for _, f in oczekujace: f.cancel()
+                oczekujace.clear()
+                nastepny_offset = offset + len(page_of_ads)
+    finally:
+        for _, f in oczekujace: f.cancel()
+
+
+def ocen_ogloszenie(ad_data, indeks_kategorii, cache=None):
+    """Pobiera statystyki i liczbę wiadomości ogłoszenia; zwraca wiersz wyniku lub None, gdy nagroda jest za niska.
+
+    Z `cache` ogłoszenie zakończone, które było już skanowane, nie wymaga żadnego zapytania do OLX.
+    """
+    try:
+        ad_id = ad_data['id']
+        z_cache = cache.pobierz(ad_id, ad_data.get('status')) if cache is not None else None
+        if z_cache:
+            stats, total_messages_count = z_cache
+            do_zapisu = False
+        else:
+            stats = OLX_CLIENT.get('adverts/{id}/statistics', f"/adverts/{ad_id}/statistics").get('data', {})
+            total_messages_count, do_zapisu = pobierz_liczbe_wiadomosci(ad_id)
+
+        created_at_str = ad_data.get('created_at')
+        total_age_days = (datetime.now(timezone.utc) - datetime.fromisoformat(created_at_str.replace(' ', 'T')).replace(tzinfo=timezone.utc)).days if created_at_str else 0
+        reward = calculate_reward(stats, total_messages_count, total_age_days)
+        if cache is not None and do_zapisu: cache.zapisz(ad_data, stats, total_messages_count, reward)
+
+        if reward > MIN_REWARD_SCORE:
+            return {
+                'ID Ogłoszenia': ad_data['id'],
+                'Tytuł': ad_data['title'],
+                'Opis': ad_data['description'],
+                'ID Kategorii': ad_data['category_id'],
+                'Pełna ścieżka kategorii': indeks_kategorii.sciezka(ad_data.get('category_id'), "Brak ścieżki")
+            }
+    except (requests.exceptions.RequestException, KeyError, TypeError): pass
+    return None
+
+def zamknij_gotowe_strony(otwarte_strony, checkpoint, czekaj=False):
+    """Zamyka strony skanu, których wszystkie ogłoszenia są już ocenione, i zwraca ich wyniki - w kolejności skanowania."""
+    wyniki_stron = []
+    while otwarte_strony and (czekaj or all(f.done() for f in otwarte_strony[0]['oceny'])):
+        strona = otwarte_strony.popleft()
+        # Wyniki zbieramy w kolejności skanowania, tak jak w wersji szeregowej.
+        wyniki = [wynik for wynik in (f.result() for f in strona.pop('oceny')) if wynik is not None]
+        wyniki_stron.extend(wyniki)
+        if checkpoint is not None: checkpoint.dopisz('etap1_strony', dict(strona, wyniki=wyniki))
+    return wyniki_stron
+
+def skanuj_ogloszenia(indeks_kategorii, cache=None, checkpoint=None, stan=None):
+    """Generator ogłoszeń o wysokiej nagrodzie w kolejności skanowania, oddawanych zaraz po zamknięciu ich strony.
+
+    Najpierw oddaje wyniki stron zapisanych w punkcie kontrolnym, potem skanuje dalej. Do `stan`
+    trafiają liczba przetworzonych ogłoszeń ('przetworzone') i informacja o błędzie API ('blad').
+    """
+    stan = stan if stan is not None else {}
+    # Strony zamknięte w poprzednim (przerwanym) uruchomieniu nie są skanowane ponownie.
+    zapisane_strony = checkpoint.wczytaj('etap1_strony') if checkpoint is not None else []
+    processed_ads_count = sum(strona['przetworzone'] for strona in zapisane_strony)
+    start_offset = zapisane_strony[-1]['nastepny_offset'] if zapisane_strony else 0
+    progress_bar_total = MAX_ADS_TO_PROCESS if MAX_ADS_TO_PROCESS > 0 else None
+    stan.update(przetworzone=processed_ads_count, blad=False)
+    
+    statusy_zakonczone = STATUSY_ZAKONCZONE
+    print(f"INFO: Skrypt będzie analizował tylko ogłoszenia o statusach: {', '.join(statusy_zakonczone)}")
+    if cache is not None: print(f"INFO: Cache ogłoszeń '{cache.sciezka}' zawiera {len(cache)} wpisów.")
+    if zapisane_strony: print(f"INFO: Wznawiam skanowanie od pozycji {start_offset} ({processed_ads_count} ogłoszeń z punktu kontrolnego).")
+    for strona in zapisane_strony:
+        yield from strona['wyniki']
+
+    otwarte_strony = deque()
+    # Strony, statystyki i wątki pobierane są równolegle; tempo zapytań trzyma wspólny OLX_LIMITER.
+    with tqdm(total=progress_bar_total, initial=processed_ads_count, desc="Skanowanie ogłoszeń", unit=" ogł.") as pbar, \
+            ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as pool:
+        for offset, page_of_ads in iteruj_strony_ogloszen(pool, MAX_ADS_TO_PROCESS, start_offset, stan):
+            limit_reached = False
+            strona = {'offset': offset, 'przetworzone': 0, 'oceny': []}
             for ad_data in page_of_ads:
                 if MAX_ADS_TO_PROCESS > 0 and processed_ads_count >= MAX_ADS_TO_PROCESS:
                     limit_reached = True; break
 
                 processed_ads_count += 1
-                pbar.update(1)
+                strona['przetworzone'] += 1
 
                 ad_id = ad_data.get('id')
-                if not ad_id: continue
-                
-                ad_status = ad_data.get('status')
-                if ad_status not in statusy_zakonczone:
-                    continue
+                if not ad_id or ad_data.get('status') not in statusy_zakonczone:
+                    pbar.update(1); continue
+
+                future = pool.submit(ocen_ogloszenie, ad_data, indeks_kategorii, cache)
+                future.add_done_callback(lambda _: pbar.update(1))
+                strona['oceny'].append(future)
+            strona['nastepny_offset'] = offset + strona['przetworzone']
+            otwarte_strony.append(strona)
+            stan['przetworzone'] = processed_ads_count
+            yield from zamknij_gotowe_strony(otwarte_strony, checkpoint)
+            if limit_reached: break
+        yield from zamknij_gotowe_strony(otwarte_strony, checkpoint, czekaj=True)
+
+def wczytaj_audyty(checkpoint, nazwa):
+    """Zwraca (audyt_mapa, ID już audytowanych ogłoszeń) z paczek zapisanych w punkcie kontrolnym."""
+    audyt_mapa, audytowane = {}, set()
+    if checkpoint is None: return audyt_mapa, audytowane
+    for rekord in checkpoint.wczytaj(nazwa):
+        audytowane.update(rekord['ids'])
+        audyt_mapa.update((id_ogloszenia, wynik) for id_ogloszenia, wynik in rekord['audyt'])
+    return audyt_mapa, audytowane
+
+def zapisz_audyt(checkpoint, nazwa, ids, audyt_paczki):
+    if checkpoint is not None: checkpoint.dopisz(nazwa, {'ids': ids, 'audyt': list(audyt_paczki.items())})
+
+def utworz_kategoryzator(indeks_kategorii, checkpoint=None):
+    preklasyfikator = CategoryPreclassifier(indeks_kategorii, top_k=PREKLASYFIKATOR_TOP_K, prog_pewnosci=PREKLASYFIKATOR_PROG_PEWNOSCI) if UZYJ_PREKLASYFIKATORA else None
+    return HierarchicalCategorizer(LLM_DISPATCHER, MODEL_KATEGORYZACJI, indeks_kategorii, rozmiar_paczki=ROZMIAR_PACZKI_KATEGORYZACJI, checkpoint=checkpoint, preklasyfikator=preklasyfikator)
+
+def utworz_audytora(system_prompt, parsuj_wynik):
+    return AuditBatcher(LLM_DISPATCHER, MODEL_EKSPERTA_AUDYTORA, system_prompt, parsuj_wynik, budzet_tokenow=LIMIT_TOKENOW_PACZKI_AUDYTU, max_paczka=ROZMIAR_PACZKI_DO_ANALIZY_AI)
+
+def kategoryzuj_wiersze(wiersze, kategoryzator, postep=True):
+    """Etap 2.1 dla listy wierszy (słowników) z kolumną 'Czysty_opis'; zwraca wyniki_etapu1."""
+    sugestie = kategoryzator.kategoryzuj([(w['Tytuł'], w['Czysty_opis'], w['ID Ogłoszenia']) for w in wiersze], postep=postep)
+    return [{'oryginalny_wiersz': w, 'Sugestia AI (Etap 1)': sugestia} for w, sugestia in zip(wiersze, sugestie)]
+
+def audytuj_sugestie(wyniki_etapu1, indeks_kategorii, audyt_mapa, audytowane, checkpoint=None, postep=True, nieudane=None):
+    """Etap 2.2: audyt paczek sugestii; uzupełnia `audyt_mapa` i `audytowane` (pomija już audytowane ogłoszenia),
+    a ID ogłoszeń bez wyniku audytu dopisuje do `nieudane`."""
+    system_prompt_etap2 = """Jesteś Sędzią-Ekspertem. Oceń, czy 'Sugerowana kategoria' jest poprawna i lepsza lub równie dobra jak 'Oryginalna kategoria'. Odpowiedź MUSI być obiektem JSON z kluczem "wyniki_audytu", zawierającym listę obiektów: {"id_ogloszenia": int, "ocena": "dobra"|"zła", "komentarz": "..."}."""
+    pozycje = []
+    for wynik in wyniki_etapu1:
+        wiersz = wynik['oryginalny_wiersz']
+        if wiersz['ID Ogłoszenia'] in audytowane: continue
+        pozycje.append((wiersz['ID Ogłoszenia'], f"---\nID Ogłoszenia: {wiersz['ID Ogłoszenia']}\nTytuł: {wiersz['Tytuł']}\nOpis: {wiersz['Czysty_opis']}\nOryginalna kategoria: {wiersz['Pełna ścieżka kategorii']}\nSugerowana kategoria: {get_sciezke_kategorii(wynik['Sugestia AI (Etap 1)'], indeks_kategorii)}\n"))
 
-                try:
-                    time.sleep(DELAY_BETWEEN_REQUESTS)
-                    stats_res = requests.get(f"{BASE_OLX_API_URL}/adverts/{ad_id}/statistics", headers=OLX_HEADERS)
-                    stats_res.raise_for_status()
-                    stats = stats_res.json().get('data', {})
-
-                    total_messages_count = get_total_message_count(ad_id)
-                    created_at_str = ad_data.get('created_at')
-                    total_age_days = (datetime.now(timezone.utc) - datetime.fromisoformat(created_at_str.replace(' ', 'T')).replace(tzinfo=timezone.utc)).days if created_at_str else 0
-                    reward = calculate_reward(stats, total_messages_count, total_age_days)
-
-                    if reward > MIN_REWARD_SCORE:
-                        high_performing_ads.append({
-                            'ID Ogłoszenia': ad_data['id'],
-                            'Tytuł': ad_data['title'],
-                            'Opis': ad_data['description'],
-                            'ID Kategorii': ad_data['category_id'],
-                            'Pełna ścieżka kategorii': mapa_sciezek.get(ad_data.get('category_id'), "Brak ścieżki")
-                        })
-                except (requests.exceptions.RequestException, KeyError, TypeError): continue
-            offset += len(page_of_ads)
+    def zapisz_paczke(ids, audyt_paczki):
+        audyt_mapa.update(audyt_paczki)
+        audytowane.update(ids)
+        zapisz_audyt(checkpoint, 'etap2_2_audyt', ids, audyt_paczki)
 
-    print(f"\n--- Zakończono Etap 1 ---")
-    print(f"✅ Przeskanowano {processed_ads_count} ogłoszeń. Znaleziono {len(high_performing_ads)} zakończonych ofert o wysokim potencjale.")
-    return pd.DataFrame(high_performing_ads)
+    audytor = utworz_audytora(system_prompt_etap2, lambda item: {'ocena': item['ocena'], 'komentarz': item['komentarz']} if 'ocena' in item and 'komentarz' in item else None)
+    audytor.audytuj(pozycje, zapisz_paczke, opis="Audyt Ekspercki AI", postep=postep)
+    if nieudane is not None: nieudane.extend(audytor.nieudane)
+
+def koryguj_sugestie(wyniki_etapu1, indeks_kategorii, audyt_mapa, zapisane_korekty, checkpoint=None, postep=True):
+    """Etap 2.3: rozstrzyga sugestie ocenione jako 'zła'; zwraca wiersze z 'Sugerowane ID nowej kategorii'."""
+    system_prompt_etap3 = "Jesteś inteligentnym asystentem. Wybierz LEPSZĄ kategorię z dwóch opcji, biorąc pod uwagę komentarz eksperta. Odpowiedz tylko i wyłącznie numerem ID wybranej kategorii."
+    korekty = {}  # indeks wyniku -> (zapytanie, future z odpowiedzią)
+    for nr, wynik in enumerate(wyniki_etapu1):
+        wiersz = wynik['oryginalny_wiersz']
+        audyt = audyt_mapa.get(wiersz['ID Ogłoszenia'])
+        if audyt and audyt['ocena'] == 'zła' and wiersz['ID Ogłoszenia'] not in zapisane_korekty:
+            user_prompt = f"""Produkt: "{wiersz['Tytuł']}"\nOpis: "{wiersz['Czysty_opis']}"\nKomentarz eksperta: "{audyt['komentarz']}"\nWybierz lepszą opcję z poniższych:\nOpcja A: {wiersz['ID Kategorii']}: {wiersz['Pełna ścieżka kategorii']}\nOpcja B: {wynik['Sugestia AI (Etap 1)']}: {get_sciezke_kategorii(wynik['Sugestia AI (Etap 1)'], indeks_kategorii)}\nPodaj tylko ID lepszej kategorii:"""
+            zapytanie = dict(model=MODEL_KATEGORYZACJI, messages=[{"role": "system", "content": system_prompt_etap3}, {"role": "user", "content": user_prompt}], temperature=0.0, timeout=60)
+            korekty[nr] = (zapytanie, LLM_DISPATCHER.submit(**zapytanie))
+
+    finalne_wyniki_korekty = []
+    for nr, wynik in enumerate(tqdm(wyniki_etapu1, desc="Korekta po audycie", disable=not postep)):
+        wiersz = wynik['oryginalny_wiersz']
+        finalny_id = wynik['Sugestia AI (Etap 1)']
+
+        if wiersz['ID Ogłoszenia'] in zapisane_korekty:
+            finalny_id = zapisane_korekty[wiersz['ID Ogłoszenia']]
+        elif nr in korekty:
+            zapytanie, future = korekty[nr]
+            try:
+                werdykt_str = future.result().choices[0].message.content.strip()
+                if werdykt_str.isdigit() and int(werdykt_str) in [wiersz['ID Kategorii'], wynik['Sugestia AI (Etap 1)']]:
+                    finalny_id = int(werdykt_str)
+                    zapisane_korekty[wiersz['ID Ogłoszenia']] = finalny_id
+                    if checkpoint is not None: checkpoint.dopisz('etap2_3_korekty', {'id': wiersz['ID Ogłoszenia'], 'finalny_id': finalny_id})
+                else:
+                    # Nieużywalna odpowiedź nie trafia do cache ani punktu kontrolnego - wznowienie zapyta API ponownie.
+                    LLM_DISPATCHER.odrzuc(zapytanie)
+                    finalny_id = 'BŁĄD_KOREKTY'
+            except Exception: finalny_id = 'BŁĄD_API_3'
+
+        wiersz['Sugerowane ID nowej kategorii'] = finalny_id
+        finalne_wyniki_korekty.append(wiersz)
+    return finalne_wyniki_korekty
+
+def weryfikuj_kategorie(df_reklasyfikowane, indeks_kategorii, audyt_mapa, audytowane, checkpoint=None, postep=True, nieudane=None):
+    """Etap 3: końcowy audyt paczek; zwraca DataFrame z kolumnami Ocena_Pewnosci i Uzasadnienie_Audytora.
+    ID ogłoszeń bez wyniku audytu dopisuje do `nieudane`."""
+    df_reklasyfikowane['Sugerowana pełna ścieżka'] = df_reklasyfikowane['Sugerowane ID nowej kategorii'].apply(lambda x: get_sciezke_kategorii(x, indeks_kategorii))
+
+    system_prompt_audytora = """Jesteś ostatecznym audytorem jakości. Oceń poprawność przypisanej kategorii. Zwróć ocenę pewności w skali 1-5 (5=idealna, 1=błąd). Odpowiedź MUSI być obiektem JSON z kluczem "wyniki_audytu", zawierającym listę obiektów: {"id_ogloszenia": int, "ocena_pewnosci": int, "uzasadnienie": "..."}."""
+
+    do_audytu = df_reklasyfikowane[~df_reklasyfikowane['ID Ogłoszenia'].isin(audytowane)]
+    pozycje = [(row['ID Ogłoszenia'], f"---\nID Ogłoszenia: {row['ID Ogłoszenia']}\nTytuł: {row['Tytuł']}\nOpis: {row['Czysty_opis']}\nOSTATECZNA KATEGORIA: {row['Sugerowana pełna ścieżka']}\n")
+               for row in do_audytu.to_dict('records')]
+
+    def zapisz_paczke(ids, audyt_paczki):
+        audyt_mapa.update(audyt_paczki)
+        audytowane.update(ids)
+        zapisz_audyt(checkpoint, 'etap3_audyt', ids, audyt_paczki)
+
+    audytor = utworz_audytora(system_prompt_audytora, lambda item: {'Ocena_Pewnosci': item['ocena_pewnosci'], 'Uzasadnienie_Audytora': item['uzasadnienie']} if 'ocena_pewnosci' in item and 'uzasadnienie' in item else None)
+    audytor.audytuj(pozycje, zapisz_paczke, opis="Finalna weryfikacja AI", postep=postep)
+    if nieudane is not None: nieudane.extend(audytor.nieudane)
+
+    ids_partii = set(df_reklasyfikowane['ID Ogłoszenia'])
+    df_audytu = pd.DataFrame.from_dict({k: v for k, v in audyt_mapa.items() if k in ids_partii}, orient='index', columns=['Ocena_Pewnosci', 'Uzasadnienie_Audytora'])
+    df_audytu.index.name = 'ID Ogłoszenia'
+    df_wynikowe = df_reklasyfikowane.merge(df_audytu, on='ID Ogłoszenia', how='left')
+    df_wynikowe['Ocena_Pewnosci'] = df_wynikowe['Ocena_Pewnosci'].fillna(0)
+    df_wynikowe['Uzasadnienie_Audytora'] = df_wynikowe['Uzasadnienie_Audytora'].fillna('Audyt nie powiódł się')
+    return df_wynikowe
+
+def bledy_korekty(wiersze):
+    """ID ogłoszeń, których korekta (Etap 2.3) się nie powiodła - nie są zapisane w punkcie kontrolnym."""
+    return [w['ID Ogłoszenia'] for w in wiersze if w['Sugerowane ID nowej kategorii'] in ('BŁĄD_KOREKTY', 'BŁĄD_API_3')]
+
+def zamknij_etap_bez_bledow(checkpoint, etap, df, nieudane):
+    """Zamyka etap tylko wtedy, gdy wszystkie ogłoszenia mają wynik; inaczej etap zostaje otwarty i kolejny przebieg go wznowi."""
+    if not nieudane:
+        checkpoint.zapisz_etap(etap, df)
+        return
+    print(f"UWAGA: {len(nieudane)} ogłoszeń bez wyniku AI - {etap} pozostaje niezakończony; kolejne uruchomienie ponowi tylko je.")
+
+def pomin_po_niepelnym_etapie(etap, etapy, checkpoint):
+    """Gdy etap został otwarty (niepełny skan, ogłoszenia bez wyniku AI), pomija kolejne etapy: ich zamknięcie
+    sprawiłoby, że następny przebieg wyczyściłby punkty kontrolne i zaczął od zera zamiast wznowić."""
+    if checkpoint.czy_zakonczony(f'etap{etap}') or not any(e > etap for e in etapy): return etapy
+    print(f"\n⚠️ Etap {etap} niepełny - pomijam kolejne etapy. Uruchom program ponownie, aby go wznowić i dokończyć przebieg.")
+    return [e for e in etapy if e <= etap]
+
+# ==============================================================================
+# =========================   GŁÓWNE ETAPY PROCESU   =========================
+# ==============================================================================
 
-def etap2_reklasyfikuj_z_audytem(df_dobre_ogloszenia, mapa_zaawansowana):
+@TELEMETRIA.mierzony('etap1')
+def etap1_skanuj_i_filtruj(indeks_kategorii, cache=None, checkpoint=None):
+    print("\n" + "="*80)
+    print("--- ETAP 1: Skanowanie i Filtracja Ogłoszeń na OLX ---")
+    print("="*80)
+
+    if checkpoint is not None and checkpoint.czy_zakonczony('etap1'):
+        df = checkpoint.wczytaj_etap('etap1')
+        print(f"INFO: Etap 1 był już zakończony - wczytano {len(df)} ogłoszeń z punktu kontrolnego.")
+        return df
+
+    stan_skanu = {}
+    high_performing_ads = list(skanuj_ogloszenia(indeks_kategorii, cache, checkpoint, stan_skanu))
+
+    df = pd.DataFrame(high_performing_ads)
+    if checkpoint is not None:
+        if stan_skanu['blad']: print("UWAGA: Skan niepełny - kolejne uruchomienie wznowi go od ostatniej zapisanej strony.")
+        else: checkpoint.zapisz_etap('etap1', df)
+
+    print(f"\n--- Zakończono Etap 1 ---")
+    print(f"✅ Przeskanowano {stan_skanu['przetworzone']} ogłoszeń. Znaleziono {len(high_performing_ads)} zakończonych ofert o wysokim potencjale.")
+    if cache is not None: print(f"Cache ogłoszeń: {cache.trafienia} trafień, {cache.chybienia} chybień.")
+    print("Statystyki zapytań do OLX:")
+    OLX_CLIENT.wypisz_statystyki()
+    return df
+
+@TELEMETRIA.mierzony('etap2')
+def etap2_reklasyfikuj_z_audytem(df_dobre_ogloszenia, indeks_kategorii, checkpoint=None):
     print("\n" + "="*80)
     print("--- ETAP 2: Inteligentna Reklasyfikacja z Audytem AI ---")
     print("="*80)
 
     if df_dobre_ogloszenia.empty:
         print("Brak ogłoszeń do reklasyfikacji. Pomijam etap.")
+        if checkpoint is not None: checkpoint.zapisz_etap('etap2', pd.DataFrame())
         return pd.DataFrame()
 
-    df_dobre_ogloszenia['Czysty_opis'] = df_dobre_ogloszenia.apply(lambda row: czysc_opis(row['Opis'], row['Tytuł']), axis=1)
+    with TELEMETRIA.span('etap2', 'czyszczenie_opisow'):
+        df_dobre_ogloszenia['Czysty_opis'] = czysc_opisy(df_dobre_ogloszenia['Opis'], df_dobre_ogloszenia['Tytuł'])
 
     print("\n[Etap 2.1] Rozpoczynam wstępną kategoryzację...")
-    system_prompt_etap1 = "Jesteś nawigatorem kategoryzacji. Zawsze wybieraj najbardziej pasującą opcję z listy. Zejdź jak najgłębiej. Odpowiedz tylko i wyłącznie numerem ID wybranej opcji."
-    wyniki_etapu1 = []
-
-    for index, wiersz in tqdm(df_dobre_ogloszenia.iterrows(), total=len(df_dobre_ogloszenia), desc="Kategoryzacja AI"):
-        sugestia_ai_id = None
-        aktualne_opcje_ids = [kat_id for kat_id, kat in mapa_zaawansowana.items() if kat.get('parent_id') == 0]
-        sciezka_wyboru = []
-        krok = 1
-        while True:
-            if not aktualne_opcje_ids: break
-            opcje_dla_ai = "\n".join([f"{kat_id}: {mapa_zaawansowana[kat_id]['name']}" for kat_id in aktualne_opcje_ids])
-            sciezka_str = " > ".join(sciezka_wyboru)
-            user_prompt = f"""Krok {krok}. Aktualna ścieżka: "{sciezka_str if sciezka_str else 'START'}". Wybierz najlepszą podkategorię z listy dla produktu poniżej.\nTytuł: "{wiersz['Tytuł']}"\nOpis: "{wiersz['Czysty_opis']}"\n--- OPCJE ---\n{opcje_dla_ai}\n--- KONIEC ---\nPodaj tylko ID najlepszej opcji:"""
-            try:
-                response = OPENAI_CLIENT.chat.completions.create(model=MODEL_KATEGORYZACJI, messages=[{"role": "system", "content": system_prompt_etap1}, {"role": "user", "content": user_prompt}], temperature=0.0, timeout=60)
-                wybrane_id_str = response.choices[0].message.content.strip()
-                if not wybrane_id_str.isdigit() or int(wybrane_id_str) not in aktualne_opcje_ids:
-                    sugestia_ai_id = sugestia_ai_id or 'BŁĄD_ETAP1'; break
-                wybrane_id = int(wybrane_id_str)
-                sugestia_ai_id = wybrane_id
-                sciezka_wyboru.append(mapa_zaawansowana[wybrane_id]['name'])
-                if mapa_zaawansowana[wybrane_id]['is_leaf'] or not mapa_zaawansowana[wybrane_id]['children_ids']: break
-                aktualne_opcje_ids = mapa_zaawansowana[wybrane_id]['children_ids']
-                krok += 1
-            except Exception as e:
-                print(f" -> BŁĄD API w Etapie 1 dla ID {wiersz['ID Ogłoszenia']}: {e}"); sugestia_ai_id = 'BŁĄD_API_1'; break
-            time.sleep(0.2)
-
-        wyniki_etapu1.append({'oryginalny_wiersz': wiersz.to_dict(), 'Sugestia AI (Etap 1)': sugestia_ai_id})
-
-    print(f"✅ Zakończono kategoryzację dla {len(wyniki_etapu1)} ogłoszeń.")
+    kategoryzator = utworz_kategoryzator(indeks_kategorii, checkpoint)
+    with TELEMETRIA.span('etap2', '2.1 kategoryzacja'):
+        wyniki_etapu1 = kategoryzuj_wiersze([wiersz.to_dict() for _, wiersz in df_dobre_ogloszenia.iterrows()], kategoryzator)
+
+    print(f"✅ Zakończono kategoryzację dla {len(wyniki_etapu1)} ogłoszeń ({kategoryzator.wywolania_llm} wywołań LLM, {kategoryzator.trafienia_cache} decyzji z cache, {kategoryzator.decyzje_lokalne} decyzji lokalnych).")
 
     print("\n[Etap 2.2] Przeprowadzam audyt ekspercki wyników...")
-    system_prompt_etap2 = """Jesteś Sędzią-Ekspertem. Oceń, czy 'Sugerowana kategoria' jest poprawna i lepsza lub równie dobra jak 'Oryginalna kategoria'. Odpowiedź MUSI być obiektem JSON z kluczem "wyniki_audytu", zawierającym listę obiektów: {"id_ogloszenia": int, "ocena": "dobra"|"zła", "komentarz": "..."}."""
-    audyt_mapa = {}
-    for i in tqdm(range(0, len(wyniki_etapu1), ROZMIAR_PACZKI_DO_ANALIZY_AI), desc="Audyt Ekspercki AI"):
-        paczka = wyniki_etapu1[i:i + ROZMIAR_PACZKI_DO_ANALIZY_AI]
-        dane_do_audytu_str = ""
-        for wynik in paczka:
-            wiersz = wynik['oryginalny_wiersz']
-            dane_do_audytu_str += f"---\nID Ogłoszenia: {wiersz['ID Ogłoszenia']}\nTytuł: {wiersz['Tytuł']}\nOpis: {wiersz['Czysty_opis']}\nOryginalna kategoria: {wiersz['Pełna ścieżka kategorii']}\nSugerowana kategoria: {get_sciezke_kategorii(wynik['Sugestia AI (Etap 1)'], mapa_zaawansowana)}\n"
-        user_prompt = f"Oceń poniższe wyniki kategoryzacji i zwróć listę JSON w wymaganym formacie:\n\n{dane_do_audytu_str}"
-        try:
-            response = OPENAI_CLIENT.chat.completions.create(model=MODEL_EKSPERTA_AUDYTORA, response_format={"type": "json_object"}, messages=[{"role": "system", "content": system_prompt_etap2}, {"role": "user", "content": user_prompt}], temperature=0.0, timeout=400)
-            audyt_dane = json.loads(response.choices[0].message.content.strip())
-            for item in audyt_dane.get('wyniki_audytu', []):
-                if isinstance(item, dict) and all(k in item for k in ['id_ogloszenia', 'ocena', 'komentarz']):
-                    audyt_mapa[item['id_ogloszenia']] = {'ocena': item['ocena'], 'komentarz': item['komentarz']}
-        except Exception as e:
-            print(f" -> KRYTYCZNY BŁĄD podczas audytu paczki: {e}")
-        time.sleep(1)
+    audyt_mapa, audytowane = wczytaj_audyty(checkpoint, 'etap2_2_audyt')
+    with TELEMETRIA.span('etap2', '2.2 audyt'):
+        nieudane = []
+        audytuj_sugestie(wyniki_etapu1, indeks_kategorii, audyt_mapa, audytowane, checkpoint, nieudane=nieudane)
 
     print("\n[Etap 2.3] Koryguję błędne sugestie na podstawie audytu...")
-    system_prompt_etap3 = "Jesteś inteligentnym asystentem. Wybierz LEPSZĄ kategorię z dwóch opcji, biorąc pod uwagę komentarz eksperta. Odpowiedz tylko i wyłącznie numerem ID wybranej kategorii."
-    finalne_wyniki_korekty = []
-    for wynik in tqdm(wyniki_etapu1, desc="Korekta po audycie"):
-        wiersz = wynik['oryginalny_wiersz']
-        id_ogloszenia = wiersz['ID Ogłoszenia']
-        audyt = audyt_mapa.get(id_ogloszenia)
-        finalny_id = wynik['Sugestia AI (Etap 1)']
-
-        if audyt and audyt['ocena'] == 'zła':
-            user_prompt = f"""Produkt: "{wiersz['Tytuł']}"\nOpis: "{wiersz['Czysty_opis']}"\nKomentarz eksperta: "{audyt['komentarz']}"\nWybierz lepszą opcję z poniższych:\nOpcja A: {wiersz['ID Kategorii']}: {wiersz['Pełna ścieżka kategorii']}\nOpcja B: {wynik['Sugestia AI (Etap 1)']}: {get_sciezke_kategorii(wynik['Sugestia AI (Etap 1)'], mapa_zaawansowana)}\nPodaj tylko ID lepszej kategorii:"""
-            try:
-                response = OPENAI_CLIENT.chat.completions.create(model=MODEL_KATEGORYZACJI, messages=[{"role": "system", "content": system_prompt_etap3}, {"role": "user", "content": user_prompt}], temperature=0.0, timeout=60)
-                werdykt_str = response.choices[0].message.content.strip()
-                if werdykt_str.isdigit() and int(werdykt_str) in [wiersz['ID Kategorii'], wynik['Sugestia AI (Etap 1)']]:
-                    finalny_id = int(werdykt_str)
-                else: finalny_id = 'BŁĄD_KOREKTY'
-            except Exception: finalny_id = 'BŁĄD_API_3'
-            time.sleep(0.2)
-
-        wiersz['Sugerowane ID nowej kategorii'] = finalny_id
-        finalne_wyniki_korekty.append(wiersz)
+    zapisane_korekty = {r['id']: r['finalny_id'] for r in checkpoint.wczytaj('etap2_3_korekty')} if checkpoint is not None else {}
+    with TELEMETRIA.span('etap2', '2.3 korekta'):
+        finalne_wyniki_korekty = koryguj_sugestie(wyniki_etapu1, indeks_kategorii, audyt_mapa, zapisane_korekty, checkpoint)
 
     print("\n--- Zakończono Etap 2 ---")
+    LLM_DISPATCHER.wypisz_raport()
     print(f"✅ Pomyślnie reklasyfikowano {len(finalne_wyniki_korekty)} ogłoszeń.")
-    return pd.DataFrame(finalne_wyniki_korekty)
+    df_wynikowe = pd.DataFrame(finalne_wyniki_korekty)
+    nieudane += bledy_korekty(finalne_wyniki_korekty)
+    if checkpoint is not None: zamknij_etap_bez_bledow(checkpoint, 'etap2', df_wynikowe, nieudane)
+    return df_wynikowe
 
-def etap3_ostateczna_weryfikacja(df_reklasyfikowane, mapa_zaawansowana):
+@TELEMETRIA.mierzony('etap3')
+def etap3_ostateczna_weryfikacja(df_reklasyfikowane, indeks_kategorii, checkpoint=None):
     print("\n" + "="*80)
     print("--- ETAP 3: Ostateczna Weryfikacja Jakości przez AI ---")
     print("="*80)
 
     if df_reklasyfikowane.empty:
         print("Brak ogłoszeń do weryfikacji. Pomijam etap.")
+        if checkpoint is not None: checkpoint.zapisz_etap('etap3', pd.DataFrame())
         return pd.DataFrame()
 
-    df_reklasyfikowane['Sugerowana pełna ścieżka'] = df_reklasyfikowane['Sugerowane ID nowej kategorii'].apply(lambda x: get_sciezke_kategorii(x, mapa_zaawansowana))
-
-    system_prompt_audytora = """Jesteś ostatecznym audytorem jakości. Oceń poprawność przypisanej kategorii. Zwróć ocenę pewności w skali 1-5 (5=idealna, 1=błąd). Odpowiedź MUSI być obiektem JSON z kluczem "wyniki_audytu", zawierającym listę obiektów: {"id_ogloszenia": int, "ocena_pewnosci": int, "uzasadnienie": "..."}."""
-
-    audyt_mapa = {}
-    for i in tqdm(range(0, len(df_reklasyfikowane), ROZMIAR_PACZKI_DO_ANALIZY_AI), desc="Finalna weryfikacja AI"):
-        paczka = df_reklasyfikowane.iloc[i:i + ROZMIAR_PACZKI_DO_ANALIZY_AI]
-        dane_do_audytu_str = ""
-        for index, row in paczka.iterrows():
-            dane_do_audytu_str += f"---\nID Ogłoszenia: {row['ID Ogłoszenia']}\nTytuł: {row['Tytuł']}\nOpis: {row['Czysty_opis']}\nOSTATECZNA KATEGORIA: {row['Sugerowana pełna ścieżka']}\n"
-        user_prompt = f"Oceń poniższe wyniki kategoryzacji i zwróć listę JSON w wymaganym formacie:\n\n{dane_do_audytu_str}"
-        try:
-            response = OPENAI_CLIENT.chat.completions.create(model=MODEL_EKSPERTA_AUDYTORA, response_format={"type": "json_object"}, messages=[{"role": "system", "content": system_prompt_audytora}, {"role": "user", "content": user_prompt}], temperature=0.0, timeout=400)
-            audyt_dane = json.loads(response.choices[0].message.content.strip())
-            for item in audyt_dane.get('wyniki_audytu', []):
-                if isinstance(item, dict) and all(k in item for k in ['id_ogloszenia', 'ocena_pewnosci', 'uzasadnienie']):
-                    audyt_mapa[item['id_ogloszenia']] = {'Ocena_Pewnosci': item['ocena_pewnosci'], 'Uzasadnienie_Audytora': item['uzasadnienie']}
-        except Exception as e:
-            print(f" -> KRYTYCZNY BŁĄD podczas audytu paczki: {e}")
-        time.sleep(1)
-
-    df_audytu = pd.DataFrame.from_dict(audyt_mapa, orient='index')
-    df_audytu.index.name = 'ID Ogłoszenia'
-    df_wynikowe = df_reklasyfikowane.merge(df_audytu, on='ID Ogłoszenia', how='left')
-    df_wynikowe['Ocena_Pewnosci'].fillna(0, inplace=True)
-    df_wynikowe['Uzasadnienie_Audytora'].fillna('Audyt nie powiódł się', inplace=True)
+    audyt_mapa, audytowane = wczytaj_audyty(checkpoint, 'etap3_audyt')
+    nieudane = []
+    df_wynikowe = weryfikuj_kategorie(df_reklasyfikowane, indeks_kategorii, audyt_mapa, audytowane, checkpoint, nieudane=nieudane)
 
     df_wynikowe.to_csv(PLIK_WYNIKOWY, index=False, sep=';', encoding='utf-8-sig')
+    if checkpoint is not None: zamknij_etap_bez_bledow(checkpoint, 'etap3', df_wynikowe, nieudane)
 
     print("\n--- Zakończono Etap 3 ---")
+    LLM_DISPATCHER.wypisz_raport()
     print(f"✅ Pomyślnie zweryfikowano {len(df_wynikowe)} ogłoszeń. Wyniki zapisano do '{PLIK_WYNIKOWY}'.")
     return df_wynikowe
 
+# ==============================================================================
+# =================   PRZELICZANIE NAGRÓD Z CACHE (OFFLINE)   =================
+# ==============================================================================
+
+def przelicz_nagrody(cache, plik_wariantow=None):
+    """Przelicza nagrody ogłoszeń zakończonych z cache bez zapytań do OLX i OpenAI.
+
+    Bez `plik_wariantow` liczy nagrody z bieżącymi WEIGHTS i zapisuje je do cache; z plikiem
+    (lista JSON słowników wag, brakujące klucze z WEIGHTS) tylko podaje, ile ogłoszeń przeszłoby
+    próg MIN_REWARD_SCORE przy każdym wariancie.
+    """
+    df = cache.jako_dataframe()
+    if df.empty:
+        print(f"Brak zakończonych ogłoszeń w '{PLIK_CACHE_OGLOSZEN}' - najpierw uruchom Etap 1.")
+        return
+    if plik_wariantow:
+        with open(plik_wariantow, 'r', encoding='utf-8') as f:
+            warianty = [{**WEIGHTS, **wagi} for wagi in json.load(f)]
+        wybrane = przeszukaj_wagi(df, warianty, MIN_REWARD_SCORE, MIN_AD_AGE_DAYS)
+        print(f"Przegląd {len(warianty)} wariantów wag na {len(df)} ogłoszeniach z cache (próg nagrody {MIN_REWARD_SCORE}):")
+        for nr, (wagi, liczba) in enumerate(zip(warianty, wybrane), 1):
+            print(f"   {nr:>3}. {liczba:>7} ogłoszeń  {wagi}")
+        return
+    nagrody = oblicz_nagrody(df, WEIGHTS, MIN_AD_AGE_DAYS)
+    cache.zapisz_nagrody(df['id'], nagrody)
+    print(f"✅ Przeliczono nagrody {len(df)} ogłoszeń z cache: {int((nagrody > MIN_REWARD_SCORE).sum())} powyżej progu {MIN_REWARD_SCORE}.")
+
+# ==============================================================================
+# =======================   TRYB STRUMIENIOWY   =======================
+# ==============================================================================
+
+KONIEC_STRUMIENIA = object()
+
+def pobierz_partie(kolejka, rozmiar, czas_zbierania):
+    """Zbiera z kolejki do `rozmiar` elementów, czekając na dopełnienie partii najwyżej `czas_zbierania` s.
+
+    Zwraca (partia, koniec); `koniec` oznacza, że poprzedni etap zakończył pracę.
+    """
+    partia = [kolejka.get()]
+    if partia[0] is KONIEC_STRUMIENIA: return [], True
+    termin = time.monotonic() + czas_zbierania
+    while len(partia) < rozmiar:
+        try: element = kolejka.get(timeout=max(0.0, termin - time.monotonic()))
+        except queue.Empty: break
+        if element is KONIEC_STRUMIENIA: return partia, True
+        partia.append(element)
+    return partia, False
+
+def uruchom_etap_strumienia(nazwa, wejscie, wyjscie, rozmiar_partii, przetworz_partie, bledy):
+    """Pętla wątku etapu: pobiera partie z `wejscie`, przetwarza i przekazuje elementy dalej.
+
+    Po błędzie etap tylko opróżnia kolejkę wejściową, żeby poprzednie etapy nie zablokowały się na pełnej kolejce.
+    """
+    koniec = False
+    while not koniec:
+        partia, koniec = pobierz_partie(wejscie, rozmiar_partii, CZAS_ZBIERANIA_PARTII_S)
+        if not partia or bledy: continue
+        try:
+            for element in przetworz_partie(partia):
+                if wyjscie is not None: wyjscie.put(element)
+        except Exception as e:
+            print(f"\n -> KRYTYCZNY BŁĄD w etapie strumienia '{nazwa}': {e}")
+            bledy.append(e)
+    if wyjscie is not None: wyjscie.put(KONIEC_STRUMIENIA)
+
+@TELEMETRIA.mierzony('strumieniowo')
+def uruchom_strumieniowo(indeks_kategorii, cache=None, checkpoint=None):
+    """Przetwarza ogłoszenia potokowo: każde ogłoszenie o wysokiej nagrodzie trafia do kategoryzacji,
+    audytu i weryfikacji, gdy tylko zostanie znalezione, a wyniki są dopisywane do pliku na bieżąco.
+
+    Etapy połączone są ograniczonymi kolejkami (ROZMIAR_KOLEJKI_STRUMIENIA) - gdy AI nie nadąża,
+    skanowanie zwalnia zamiast gromadzić ogłoszenia w pamięci.
+    """
+    print("\n" + "="*80)
+    print("--- TRYB STRUMIENIOWY: Skanowanie, Reklasyfikacja i Weryfikacja równolegle ---")
+    print("="*80)
+
+    kolejka_kategoryzacji = queue.Queue(maxsize=ROZMIAR_KOLEJKI_STRUMIENIA)
+    kolejka_audytu = queue.Queue(maxsize=ROZMIAR_KOLEJKI_STRUMIENIA)
+    kolejka_weryfikacji = queue.Queue(maxsize=ROZMIAR_KOLEJKI_STRUMIENIA)
+    bledy, licznik, nieudane = [], {'zweryfikowane': 0}, []
+
+    kategoryzator = utworz_kategoryzator(indeks_kategorii, checkpoint)
+    audyt_mapa, audytowane = wczytaj_audyty(checkpoint, 'etap2_2_audyt')
+    zapisane_korekty = {r['id']: r['finalny_id'] for r in checkpoint.wczytaj('etap2_3_korekty')} if checkpoint is not None else {}
+    weryfikacja_mapa, zweryfikowane = wczytaj_audyty(checkpoint, 'etap3_audyt')
+    if checkpoint is not None:
+        for etap in ('etap1', 'etap2', 'etap3'): checkpoint.rozpocznij_etap(etap)
+
+    def kategoryzuj_partie(partia):
+        for wiersz in partia: wiersz['Czysty_opis'] = czysc_opis(wiersz['Opis'], wiersz['Tytuł'])
+        return kategoryzuj_wiersze(partia, kategoryzator, postep=False)
+
+    def audytuj_partie(partia):
+        audytuj_sugestie(partia, indeks_kategorii, audyt_mapa, audytowane, checkpoint, postep=False, nieudane=nieudane)
+        wiersze = koryguj_sugestie(partia, indeks_kategorii, audyt_mapa, zapisane_korekty, checkpoint, postep=False)
+        nieudane.extend(bledy_korekty(wiersze))
+        if checkpoint is not None: checkpoint.dopisz_do_etapu('etap2', pd.DataFrame(wiersze))
+        return wiersze
+
+    def weryfikuj_partie(partia):
+        df_partii = weryfikuj_kategorie(pd.DataFrame(partia), indeks_kategorii, weryfikacja_mapa, zweryfikowane, checkpoint, postep=False, nieudane=nieudane)
+        pierwsza = licznik['zweryfikowane'] == 0
+        df_partii.to_csv(PLIK_WYNIKOWY, index=False, sep=';', encoding='utf-8-sig' if pierwsza else 'utf-8', mode='w' if pierwsza else 'a', header=pierwsza)
+        if checkpoint is not None: checkpoint.dopisz_do_etapu('etap3', df_partii)
+        licznik['zweryfikowane'] += len(df_partii)
+        return []
+
+    watki = [
+        threading.Thread(target=uruchom_etap_strumienia, args=("kategoryzacja", kolejka_kategoryzacji, kolejka_audytu, ROZMIAR_PACZKI_DO_ANALIZY_AI, kategoryzuj_partie, bledy)),
+        threading.Thread(target=uruchom_etap_strumienia, args=("audyt i korekta", kolejka_audytu, kolejka_weryfikacji, ROZMIAR_PACZKI_DO_ANALIZY_AI, audytuj_partie, bledy)),
+        threading.Thread(target=uruchom_etap_strumienia, args=("weryfikacja", kolejka_weryfikacji, None, ROZMIAR_PACZKI_DO_ANALIZY_AI, weryfikuj_partie, bledy)),
+    ]
+    for watek in watki: watek.start()
+
+    stan_skanu, znalezione = {}, 0
+    try:
+        for wiersz in skanuj_ogloszenia(indeks_kategorii, cache, checkpoint, stan_skanu):
+            if bledy: break
+            znalezione += 1
+            if checkpoint is not None: checkpoint.dopisz_do_etapu('etap1', pd.DataFrame([wiersz]))
+            kolejka_kategoryzacji.put(wiersz)
+    finally:
+        kolejka_kategoryzacji.put(KONIEC_STRUMIENIA)
+        for watek in watki: watek.join()
+
+    if checkpoint is not None and not bledy and not stan_skanu.get('blad'):
+        # Etap 1 jest kompletny; Etapy 2 i 3 zostają otwarte, dopóki któreś ogłoszenie nie ma wyniku AI.
+        for etap in ('etap1',) if nieudane else ('etap1', 'etap2', 'etap3'): checkpoint.zamknij_etap(etap)
+        if nieudane: print(f"UWAGA: {len(nieudane)} ogłoszeń bez wyniku AI - Etapy 2 i 3 pozostają niezakończone; kolejne uruchomienie je ponowi.")
+
+    print("\n--- Zakończono przetwarzanie strumieniowe ---")
+    print(f"✅ Przeskanowano {stan_skanu.get('przetworzone', 0)} ogłoszeń, {znalezione} o wysokim potencjale, zweryfikowano {licznik['zweryfikowane']}. Wyniki zapisano do '{PLIK_WYNIKOWY}'.")
+    if cache is not None: print(f"Cache ogłoszeń: {cache.trafienia} trafień, {cache.chybienia} chybień.")
+    print("Statystyki zapytań do OLX:")
+    OLX_CLIENT.wypisz_statystyki()
+    LLM_DISPATCHER.wypisz_raport()
+    if bledy: raise bledy[0]
+
 # ==============================================================================
 # ===================   GŁÓWNA FUNKCJA URUCHOMIENIOWA   ==================
 # ==============================================================================
 
-def main():
+def parsuj_argumenty(argv=None):
+    parser = argparse.ArgumentParser(description="Analizator ogłoszeń OLX: skanowanie, reklasyfikacja i weryfikacja AI.")
+    parser.add_argument('--bez-cache', action='store_true', help="Nie używaj cache ogłoszeń - pobierz wszystko z OLX.")
+    parser.add_argument('--przebuduj-cache', action='store_true', help="Wyczyść cache ogłoszeń i zbuduj go od nowa podczas skanu.")
+    parser.add_argument('--bez-cache-llm', action='store_true', help="Nie używaj cache odpowiedzi OpenAI - każde zapytanie trafia do API.")
+    parser.add_argument('--uniewaznij', type=int, nargs='+', metavar='ID', help="Usuń z cache wskazane ID ogłoszeń przed skanem.")
+    parser.add_argument('--etap', type=int, nargs='+', choices=[1, 2, 3], help="Uruchom tylko wskazane etapy; wejście wczytywane jest z punktu kontrolnego poprzedniego etapu.")
+    parser.add_argument('--strumieniowo', action='store_true', help="Przetwarzaj ogłoszenia potokowo: kategoryzacja i weryfikacja startują w trakcie skanowania.")
+    parser.add_argument('--od-nowa', action='store_true', help="Usuń punkty kontrolne uruchamianych etapów zamiast wznawiać pracę.")
+    parser.add_argument('--przelicz-nagrody', action='store_true', help="Tylko przelicz nagrody ogłoszeń z cache bieżącymi WEIGHTS (bez zapytań do API) i zakończ.")
+    parser.add_argument('--przeglad-wag', metavar='PLIK', help="Z --przelicz-nagrody: plik JSON z listą wariantów WEIGHTS; podaj, ile ogłoszeń przechodzi próg przy każdym.")
+    parser.add_argument('--profil', nargs='?', const='profil.prof', metavar='PLIK', help="Profiluj przebieg cProfile i zapisz statystyki do PLIK (domyślnie profil.prof).")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Orkiestruje cały proces od A do Z."""
+    args = parsuj_argumenty(argv)
     print("#"*80)
     print("#####   START ZUNIFIKOWANEGO PROCESU ANALIZY OGŁOSZEŃ OLX   #####")
     print("#"*80)
 
+    if args.przelicz_nagrody:
+        cache = AdvertCache(PLIK_CACHE_OGLOSZEN, STATUSY_ZAKONCZONE)
+        try: przelicz_nagrody(cache, args.przeglad_wag)
+        finally: cache.zamknij()
+        return
+
     if not config.OPENAI_API_KEY or not config.OLX_ACCESS_TOKEN:
-        print("\n❌ BŁĄD KRYTYCZNY: Brak kluczy API w pliku config.py. Zakończono.")
+        print("\n❌ BŁĄD KRYTYCZNY: Brak kluczy API w pliku config.py ani w zmiennych środowiskowych. Zakończono.")
         return
     print("\n✅ Klucze API zostały pomyślnie wczytane.")
 
-    mapa_sciezek, mapa_zaawansowana = wczytaj_kategorie_i_zbuduj_mapy()
-    if mapa_sciezek is None:
+    indeks_kategorii = wczytaj_kategorie_i_zbuduj_mapy()
+    if indeks_kategorii is None:
         return
-    print(f"✅ Pomyślnie wczytano i przetworzono {len(mapa_zaawansowana)} kategorii.")
+    print(f"✅ Pomyślnie wczytano i przetworzono {len(indeks_kategorii)} kategorii.")
+
+    etapy = sorted(set(args.etap or [1, 2, 3])) if not args.strumieniowo else [1, 2, 3]
+    checkpoint = CheckpointStore(KATALOG_CHECKPOINTOW)
+    if args.od_nowa:
+        checkpoint.wyczysc(etapy)
+    elif etapy == [1, 2, 3] and checkpoint.czy_zakonczony('etap3'):
+        # Poprzedni pełny przebieg się zakończył - nowy przebieg zaczyna od świeżego skanu.
+        checkpoint.wyczysc()
+    elif not checkpoint.czy_pusty():
+        print(f"INFO: Znaleziono punkty kontrolne w '{KATALOG_CHECKPOINTOW}' - wznawiam przerwany przebieg.")
+
+    for etap in etapy:
+        if etap > 1 and etap - 1 not in etapy and not checkpoint.czy_zakonczony(f'etap{etap - 1}'):
+            print(f"\n❌ BŁĄD: Etap {etap} wymaga wyniku etapu {etap - 1}, którego brak w '{KATALOG_CHECKPOINTOW}'. Zakończono.")
+            return
+
+    cache = None
+    if 1 in etapy and not args.bez_cache:
+        cache = AdvertCache(PLIK_CACHE_OGLOSZEN, STATUSY_ZAKONCZONE)
+        if args.przebuduj_cache: cache.uniewaznij()
+        elif args.uniewaznij: cache.uniewaznij(args.uniewaznij)
+
+    cache_llm = None
+    if LLM_DISPATCHER is not None and not args.bez_cache_llm:
+        cache_llm = LLM_DISPATCHER.cache = ResponseCache(PLIK_CACHE_ODPOWIEDZI_LLM, LLM_CACHE_MAX_WPISOW, LLM_CACHE_MAX_WIEK_DNI * 86400)
 
     # Uruchomienie kolejnych etapów
-    df_etap1 = etap1_skanuj_i_filtruj(mapa_sciezek)
-    df_etap2 = etap2_reklasyfikuj_z_audytem(df_etap1, mapa_zaawansowana)
-    df_finalny = etap3_ostateczna_weryfikacja(df_etap2, mapa_zaawansowana)
+    df_finalny = None
+    try:
+        with profiluj(args.profil):
+            if args.strumieniowo:
+                try:
+                    uruchom_strumieniowo(indeks_kategorii, cache, checkpoint)
+                finally:
+                    if cache is not None: cache.zamknij()
+                etapy = []
+            if 1 in etapy:
+                try:
+                    df_etap1 = etap1_skanuj_i_filtruj(indeks_kategorii, cache, checkpoint)
+                finally:
+                    if cache is not None: cache.zamknij()
+                etapy = pomin_po_niepelnym_etapie(1, etapy, checkpoint)
+            if 2 in etapy:
+                df_etap1 = df_etap1 if 1 in etapy else checkpoint.wczytaj_etap('etap1')
+                df_etap2 = etap2_reklasyfikuj_z_audytem(df_etap1, indeks_kategorii, checkpoint)
+                etapy = pomin_po_niepelnym_etapie(2, etapy, checkpoint)
+            if 3 in etapy:
+                df_etap2 = df_etap2 if 2 in etapy else checkpoint.wczytaj_etap('etap2')
+                df_finalny = etap3_ostateczna_weryfikacja(df_etap2, indeks_kategorii, checkpoint)
+    finally:
+        if cache_llm is not None:
+            LLM_DISPATCHER.anuluj_oczekujace()
+            cache_llm.zamknij()
+            LLM_DISPATCHER.cache = None
+        # Raport telemetrii zapisujemy także po przerwanym przebiegu - wtedy jest najbardziej potrzebny.
+        TELEMETRIA.zapisz_json(PLIK_TELEMETRII)
+        print()
+        TELEMETRIA.wypisz_podsumowanie()
+        print(f"Raport telemetrii zapisano do '{PLIK_TELEMETRII}'.")
 
     print("\n" + "#"*80)
     print("#####   PROCES ZAKOŃCZONY   #####")
-    print(f"Końcowy raport został zapisany w pliku: {PLIK_WYNIKOWY}")
+    if 3 in etapy or args.strumieniowo: print(f"Końcowy raport został zapisany w pliku: {PLIK_WYNIKOWY}")
     if df_finalny is not None and not df_finalny.empty:
         print("\nPróbka ostatecznych wyników:")
         print(df_finalny[['ID Ogłoszenia', 'Tytuł', 'Sugerowana pełna ścieżka', 'Ocena_Pewnosci']].head())
@@ -0,0 +1,112 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class OlxClient:
+    """Wspólna warstwa dostępu do OLX Partner API.
+
+    Jedna sesja `requests` z pulą połączeń keep-alive (bez nowego handshake'u TCP+TLS
+    na każde zapytanie), ponawianie z wykładniczym backoffem na 429/5xx i błędach
+    połączenia z poszanowaniem nagłówka Retry-After oraz liczniki per endpoint. Przy wspólnym
+    limiterze 429 i Retry-After wstrzymują wszystkie wątki, nie tylko ten, który dostał odpowiedź.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url, headers, limiter=None, pool_size=16, max_retries=4, backoff=0.5, max_backoff=60.0, timeout=30, telemetria=None):
+        self.base_url = base_url.rstrip('/')
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.telemetria = telemetria
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._liczniki = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint, path, params=None):
+        """Wykonuje GET i zwraca zdekodowany JSON. `endpoint` to nazwa używana w licznikach.
+
+        Po wyczerpaniu ponowień rzuca `requests.exceptions.RequestException`, tak jak goły `requests.get`.
+        """
+        proba = 0
+        while True:
+            if self.limiter:
+                oczekiwanie = self.limiter.acquire()
+                if self.telemetria is not None: self.telemetria.dodaj('olx_oczekiwanie_s', oczekiwanie, endpoint)
+            start = time.perf_counter()
+            try:
+                response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+                latencja = time.perf_counter() - start
+                if self.telemetria is not None: self.telemetria.dodaj('olx_bajty', len(response.content), endpoint)
+                if response.status_code in self.RETRY_STATUSES and proba < self.max_retries:
+                    self._zapisz(endpoint, latencja, ponowienie=True)
+                    proba += 1
+                    retry_after = response.headers.get('Retry-After')
+                    opoznienie = self._opoznienie(proba, retry_after)
+                    # 429 i Retry-After dotyczą całego klienta - przerwa we wspólnym limiterze zatrzymuje wszystkie wątki.
+                    if self.limiter and (response.status_code == 429 or retry_after): self.limiter.wstrzymaj(opoznienie)
+                    else: time.sleep(opoznienie)
+                    continue
+                response.raise_for_status()
+                dane = response.json()
+            except requests.exceptions.HTTPError:
+                self._zapisz(endpoint, time.perf_counter() - start, blad=True)
+                raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if proba < self.max_retries:
+                    self._zapisz(endpoint, time.perf_counter() - start, ponowienie=True)
+                    proba += 1
+                    time.sleep(self._opoznienie(proba))
+                    continue
+                self._zapisz(endpoint, time.perf_counter() - start, blad=True)
+                raise
+            except requests.exceptions.RequestException:
+                self._zapisz(endpoint, time.perf_counter() - start, blad=True)
+                raise
+            self._zapisz(endpoint, latencja)
+            return dane
+
+    def _opoznienie(self, proba, retry_after=None):
+        if retry_after:
+            try:
+                return min(self.max_backoff, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    termin = parsedate_to_datetime(retry_after)
+                    return min(self.max_backoff, max(0.0, (termin - datetime.now(timezone.utc)).total_seconds()))
+                except (TypeError, ValueError):
+                    pass
+        return min(self.max_backoff, self.backoff * 2 ** (proba - 1))
+
+    def _zapisz(self, endpoint, latencja, ponowienie=False, blad=False):
+        with self._lock:
+            licznik = self._liczniki.setdefault(endpoint, {'zapytania': 0, 'ponowienia': 0, 'bledy': 0, 'czas_s': 0.0})
+            licznik['zapytania'] += 1
+            licznik['czas_s'] += latencja
+            if ponowienie: licznik['ponowienia'] += 1
+            if blad: licznik['bledy'] += 1
+        if self.telemetria is not None:
+            self.telemetria.zapisz_czas('olx', latencja, endpoint)
+            if ponowienie: self.telemetria.dodaj('olx_ponowienia', 1, endpoint)
+            if blad: self.telemetria.dodaj('olx_bledy', 1, endpoint)
+
+    def statystyki(self):
+        """Kopia liczników per endpoint wraz ze średnią latencją w ms."""
+        with self._lock:
+            return {endpoint: dict(l, srednia_latencja_ms=1000 * l['czas_s'] / l['zapytania'] if l['zapytania'] else 0.0)
+                    for endpoint, l in self._liczniki.items()}
+
+    def wypisz_statystyki(self):
+        for endpoint, l in sorted(self.statystyki().items()):
+            print(f"   {endpoint:<28} zapytań: {l['zapytania']:>7}  ponowień: {l['ponowienia']:>5}  błędów: {l['bledy']:>5}  śr. latencja: {l['srednia_latencja_ms']:.0f} ms")
@@ -0,0 +1,105 @@
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+_SLOWA = re.compile(r'\w+', re.UNICODE)
+
+
+def ngramy(tekst, n_min=3, n_max=4):
+    """Znakowe n-gramy słów (z granicami słowa), odporne na odmianę i literówki."""
+    for slowo in _SLOWA.findall(unicodedata.normalize('NFKC', tekst or '').lower()):
+        slowo = f" {slowo} "
+        for n in range(n_min, n_max + 1):
+            for i in range(len(slowo) - n + 1):
+                yield slowo[i:i + n]
+
+
+class CategoryPreclassifier:
+    """Lokalny klasyfikator TF-IDF na znakowych n-gramach ścieżek kategorii (NumPy, bez sieci).
+
+    Dokumentami są liście drzewa (pełna ścieżka + nazwa liścia), trzymane jako indeks odwrócony
+    w tablicach NumPy. Dla ogłoszenia liczone jest podobieństwo kosinusowe do każdego liścia:
+    przy wysokiej pewności `klasyfikuj` zwraca liść od razu, a w pozostałych przypadkach
+    zbiór kandydatów z `top_k` najlepszych liści (wraz z przodkami), którym zawęża się opcje dla LLM.
+    """
+
+    def __init__(self, indeks_kategorii, top_k=8, prog_pewnosci=0.6, min_przewaga=0.15, waga_tytulu=2.0, max_znakow_opisu=600):
+        self.indeks = indeks_kategorii
+        self.top_k = top_k
+        self.prog_pewnosci = prog_pewnosci
+        self.min_przewaga = min_przewaga
+        self.waga_tytulu = waga_tytulu
+        self.max_znakow_opisu = max_znakow_opisu
+        self.liscie = np.array([kat_id for kat_id in indeks_kategorii if indeks_kategorii.czy_lisc(kat_id)], dtype=np.int64)
+
+        self.slownik, wiersze, kolumny, liczby = {}, [], [], []
+        for d, kat_id in enumerate(self.liscie.tolist()):
+            liczniki = Counter(ngramy(indeks_kategorii.sciezka(kat_id)))
+            liczniki.update(ngramy(indeks_kategorii.nazwa(kat_id)))  # Nazwa liścia liczy się podwójnie
+            for ngram, liczba in liczniki.items():
+                wiersze.append(d)
+                kolumny.append(self.slownik.setdefault(ngram, len(self.slownik)))
+                liczby.append(liczba)
+        wiersze, kolumny = np.array(wiersze, dtype=np.int64), np.array(kolumny, dtype=np.int64)
+        n_dok, n_ngr = len(self.liscie), len(self.slownik)
+
+        df = np.bincount(kolumny, minlength=n_ngr)
+        self.idf = np.log((1 + n_dok) / (1 + df)) + 1
+        self.idf_nieznanego = np.log(1 + n_dok) + 1
+        wagi = (1 + np.log(np.array(liczby, dtype=np.float64))) * self.idf[kolumny]
+        normy = np.sqrt(np.bincount(wiersze, weights=wagi ** 2, minlength=n_dok))
+        wagi /= normy[wiersze]
+
+        # Indeks odwrócony w układzie CSR: n-gram -> (liście, wagi).
+        kolejnosc = np.argsort(kolumny, kind='stable')
+        self._dokumenty, self._wagi = wiersze[kolejnosc], wagi[kolejnosc]
+        self._start = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+
+    def oceny(self, tytul, opis=''):
+        """Podobieństwo kosinusowe ogłoszenia do każdego liścia (w kolejności `self.liscie`)."""
+        liczniki = Counter()
+        for ngram in ngramy(tytul): liczniki[ngram] += self.waga_tytulu
+        for ngram in ngramy((opis or '')[:self.max_znakow_opisu]): liczniki[ngram] += 1
+        if not liczniki or not len(self.liscie):
+            return np.zeros(len(self.liscie))
+
+        znane = [(self.slownik[ngram], liczba) for ngram, liczba in liczniki.items() if ngram in self.slownik]
+        nieznane = np.array([liczba for ngram, liczba in liczniki.items() if ngram not in self.slownik], dtype=np.float64)
+        # N-gramy spoza słownika kategorii też wchodzą do normy zapytania - tekst "o czymś innym" dostaje niskie oceny.
+        norma = np.sum(((1 + np.log(nieznane)) * self.idf_nieznanego) ** 2)
+        if not znane:
+            return np.zeros(len(self.liscie))
+        kolumny = np.array([k for k, _ in znane], dtype=np.int64)
+        wagi = (1 + np.log(np.array([w for _, w in znane], dtype=np.float64))) * self.idf[kolumny]
+        wagi /= np.sqrt(norma + np.sum(wagi ** 2))
+
+        # Zbieramy wszystkie wpisy indeksu odwróconego naraz i sumujemy je bincountem.
+        poczatki, dlugosci = self._start[kolumny], self._start[kolumny + 1] - self._start[kolumny]
+        przesuniecia = np.repeat(poczatki - np.concatenate(([0], np.cumsum(dlugosci)[:-1])), dlugosci)
+        pozycje = przesuniecia + np.arange(dlugosci.sum())
+        return np.bincount(self._dokumenty[pozycje], weights=self._wagi[pozycje] * np.repeat(wagi, dlugosci), minlength=len(self.liscie))
+
+    def klasyfikuj(self, tytul, opis=''):
+        """Zwraca (liść, None) przy wysokiej pewności, (None, kandydaci) przy zawężeniu albo (None, None) bez sygnału.
+
+        `kandydaci` to zbiór ID `top_k` najlepszych liści i wszystkich ich przodków - węzłów, które
+        warto pokazać LLM na drodze w dół drzewa.
+        """
+        oceny = self.oceny(tytul, opis)
+        if not len(oceny) or oceny.max() <= 0:
+            return None, None
+        k = min(max(self.top_k, 2), len(oceny))
+        najlepsze = np.argpartition(-oceny, k - 1)[:k]
+        najlepsze = najlepsze[np.argsort(-oceny[najlepsze], kind='stable')]
+        przewaga = oceny[najlepsze[0]] - (oceny[najlepsze[1]] if k > 1 else 0.0)
+        if self.prog_pewnosci is not None and oceny[najlepsze[0]] >= self.prog_pewnosci and przewaga >= self.min_przewaga:
+            return int(self.liscie[najlepsze[0]]), None
+        if not self.top_k:
+            return None, None
+        kandydaci = set()
+        for kat_id in self.liscie[najlepsze[:self.top_k]].tolist():
+            kandydaci.add(kat_id)
+            kandydaci.update(self.indeks.przodkowie(kat_id))
+        return None, kandydaci
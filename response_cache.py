@@ -0,0 +1,99 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from openai.types.chat import ChatCompletion
+
+PARAMETRY_BEZ_WPLYWU = ('timeout', 'extra_headers')  # Nie zmieniają treści odpowiedzi - nie wchodzą do klucza
+
+
+def klucz_zapytania(zapytanie):
+    """Skrót treści zapytania: model, wiadomości (prompt systemowy i użytkownika) i pozostałe parametry."""
+    istotne = {k: v for k, v in zapytanie.items() if k not in PARAMETRY_BEZ_WPLYWU}
+    return hashlib.sha256(json.dumps(istotne, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Trwały cache odpowiedzi `chat.completions.create` w SQLite, adresowany treścią zapytania.
+
+    Wpisy starsze niż `max_wiek_s` są traktowane jak brak, a po przekroczeniu `max_wpisow`
+    usuwane są najdawniej używane. Odpowiedź trzymana jest jako JSON modelu odpowiedzi
+    i odtwarzana przez `openai.types.chat.ChatCompletion`.
+    """
+
+    SPRZATAJ_CO = 500  # Co tyle zapisów sprawdzamy limit liczby wpisów
+
+    def __init__(self, sciezka, max_wpisow=100000, max_wiek_s=30 * 86400):
+        self.sciezka = sciezka
+        self.max_wpisow = max_wpisow
+        self.max_wiek_s = max_wiek_s
+        self.trafienia = 0
+        self.chybienia = 0
+        self._zapisy = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(sciezka, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS odpowiedzi (
+                klucz TEXT PRIMARY KEY,
+                model TEXT,
+                odpowiedz TEXT,
+                utworzono REAL,
+                uzyto REAL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS odpowiedzi_uzyto ON odpowiedzi (uzyto)")
+        self._conn.commit()
+        self.usun_przeterminowane()
+
+    def pobierz(self, klucz):
+        """Zwraca odpowiedź (ChatCompletion) albo None."""
+        teraz = time.time()
+        with self._lock:
+            wiersz = self._conn.execute("SELECT odpowiedz, utworzono FROM odpowiedzi WHERE klucz = ?", (klucz,)).fetchone()
+            if wiersz is None or (self.max_wiek_s and teraz - wiersz[1] > self.max_wiek_s):
+                self.chybienia += 1
+                return None
+            self._conn.execute("UPDATE odpowiedzi SET uzyto = ? WHERE klucz = ?", (teraz, klucz))
+            self.trafienia += 1
+        return ChatCompletion.model_validate_json(wiersz[0])
+
+    def zapisz(self, klucz, model, response):
+        if not hasattr(response, 'model_dump_json'): return
+        teraz = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO odpowiedzi VALUES (?, ?, ?, ?, ?)", (klucz, model, response.model_dump_json(), teraz, teraz))
+            self._zapisy += 1
+            if self.max_wpisow and self._zapisy % self.SPRZATAJ_CO == 0:
+                self._przytnij()
+            self._conn.commit()
+
+    def usun(self, klucz):
+        with self._lock:
+            self._conn.execute("DELETE FROM odpowiedzi WHERE klucz = ?", (klucz,))
+            self._conn.commit()
+
+    def _przytnij(self):
+        nadmiar = self._conn.execute("SELECT COUNT(*) FROM odpowiedzi").fetchone()[0] - self.max_wpisow
+        if nadmiar > 0:
+            self._conn.execute("DELETE FROM odpowiedzi WHERE klucz IN (SELECT klucz FROM odpowiedzi ORDER BY uzyto LIMIT ?)", (nadmiar,))
+
+    def usun_przeterminowane(self):
+        with self._lock:
+            if self.max_wiek_s: self._conn.execute("DELETE FROM odpowiedzi WHERE utworzono < ?", (time.time() - self.max_wiek_s,))
+            if self.max_wpisow: self._przytnij()
+            self._conn.commit()
+
+    def wyczysc(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM odpowiedzi")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM odpowiedzi").fetchone()[0]
+
+    def zamknij(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,107 @@
+import cProfile
+import functools
+import io
+import json
+import math
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+
+def percentyl(posortowane, p):
+    """Percentyl (0-100) z posortowanej listy metodą najbliższej rangi."""
+    if not posortowane: return 0.0
+    return posortowane[min(len(posortowane), max(1, math.ceil(p / 100 * len(posortowane)))) - 1]
+
+
+class Telemetry:
+    """Lekki, współdzielony między wątkami zbiornik pomiarów przebiegu.
+
+    Przedziały czasu (`span`, `zapisz_czas`) trzymane są jako próbki per (nazwa, etykieta),
+    np. ('olx', 'adverts') albo ('llm', 'gpt-4o'), a liczniki (`dodaj`) jako sumy, np. bajty,
+    tokeny, ponowienia i czas oczekiwania na limitery. `raport` liczy z nich p50/p95/max,
+    `zapisz_json` zapisuje raport, a `wypisz_podsumowanie` drukuje tabelę na koniec przebiegu.
+    """
+
+    def __init__(self):
+        self._czasy = {}
+        self._liczniki = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def zapisz_czas(self, nazwa, czas_s, etykieta=''):
+        with self._lock:
+            self._czasy.setdefault((nazwa, etykieta), []).append(czas_s)
+
+    def dodaj(self, licznik, wartosc=1, etykieta=''):
+        with self._lock:
+            klucz = (licznik, etykieta)
+            self._liczniki[klucz] = self._liczniki.get(klucz, 0) + wartosc
+
+    @contextmanager
+    def span(self, nazwa, etykieta=''):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.zapisz_czas(nazwa, time.perf_counter() - start, etykieta)
+
+    def mierzony(self, nazwa, etykieta=''):
+        """Dekorator: każde wywołanie funkcji to jeden przedział `nazwa`."""
+        def dekorator(funkcja):
+            @functools.wraps(funkcja)
+            def opakowana(*args, **kwargs):
+                with self.span(nazwa, etykieta):
+                    return funkcja(*args, **kwargs)
+            return opakowana
+        return dekorator
+
+    def raport(self):
+        with self._lock:
+            czasy = {klucz: sorted(probki) for klucz, probki in self._czasy.items()}
+            liczniki = dict(self._liczniki)
+        return {
+            'czas_przebiegu_s': time.perf_counter() - self._start,
+            'przedzialy': [{'nazwa': nazwa, 'etykieta': etykieta, 'liczba': len(p), 'suma_s': sum(p), 'p50_ms': 1000 * percentyl(p, 50),
+                            'p95_ms': 1000 * percentyl(p, 95), 'max_ms': 1000 * p[-1]} for (nazwa, etykieta), p in sorted(czasy.items())],
+            'liczniki': [{'nazwa': nazwa, 'etykieta': etykieta, 'wartosc': wartosc} for (nazwa, etykieta), wartosc in sorted(liczniki.items())],
+        }
+
+    def zapisz_json(self, sciezka):
+        with open(sciezka, 'w', encoding='utf-8') as f:
+            json.dump(self.raport(), f, ensure_ascii=False, indent=2)
+
+    def wypisz_podsumowanie(self):
+        r = self.raport()
+        print(f"Telemetria przebiegu ({r['czas_przebiegu_s']:.1f} s):")
+        print(f"   {'przedział':<44} {'liczba':>8} {'suma [s]':>10} {'p50 [ms]':>10} {'p95 [ms]':>10} {'max [ms]':>10}")
+        for p in r['przedzialy']:
+            nazwa = f"{p['nazwa']}[{p['etykieta']}]" if p['etykieta'] else p['nazwa']
+            print(f"   {nazwa:<44} {p['liczba']:>8} {p['suma_s']:>10.2f} {p['p50_ms']:>10.1f} {p['p95_ms']:>10.1f} {p['max_ms']:>10.1f}")
+        for l in r['liczniki']:
+            nazwa = f"{l['nazwa']}[{l['etykieta']}]" if l['etykieta'] else l['nazwa']
+            wartosc = f"{l['wartosc']:.2f}" if isinstance(l['wartosc'], float) else str(l['wartosc'])
+            print(f"   {nazwa:<44} {wartosc:>8}")
+
+
+@contextmanager
+def profiluj(sciezka=None, top=25):
+    """Opcjonalny cProfile bloku: zapisuje statystyki do `sciezka` (None = bez profilowania) i drukuje najdroższe funkcje.
+
+    cProfile mierzy tylko wątek, w którym blok działa - pracę wątków roboczych widać w przedziałach telemetrii.
+    """
+    if not sciezka:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(sciezka)
+        wyjscie = io.StringIO()
+        pstats.Stats(profiler, stream=wyjscie).sort_stats('cumulative').print_stats(top)
+        print(f"Profil cProfile zapisano do '{sciezka}' (podgląd: python -m pstats {sciezka}). Najdroższe funkcje:")
+        print(wyjscie.getvalue())